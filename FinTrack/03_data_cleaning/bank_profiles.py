@@ -0,0 +1,195 @@
+"""
+bank_profiles.py
+================
+
+Registry of the CSV export formats of the supported banks.
+
+Each BankProfile holds the header of a bank's export together with its column map, date
+format, decimal convention, encoding and separator. A header line is identified by its
+fingerprint (its cells, in order) with a single dictionary lookup, so a file from a known
+bank is parsed with its known settings instead of generic inference.
+Files whose header matches no profile are handled with the generic COLUMN_MAPPING.
+"""
+
+from dataclasses import dataclass, field
+
+# Unified column mapping for all banks
+COLUMN_MAPPING = {
+    # Bank_A
+    "Buchung": "date",
+    "Wertstellungsdatum": "value_date",
+    "Auftraggeber/Empfänger": "sender_receiver",
+    "Buchungstext": "booking_text",
+    "Verwendungszweck": "purpose",
+    "Saldo": "balance",
+    "Währung": "currency",
+    "Betrag": "amount",
+    # Bank_B
+    "Buchungstag": "date",
+    "Wertstellungstag": "value_date",
+    "GegenIBAN": "iban",
+    "Name Gegenkonto": "sender_receiver",
+    "Umsatz": "amount",
+    # Bank_C
+    "Auftragskonto": "account_number",
+    "Valutadatum": "value_date",
+    "Glaeubiger ID": "creditor_id",
+    "Mandatsreferenz": "mandate_reference",
+    "Kundenreferenz (End-to-End)": "customer_reference",
+    "Sammlerreferenz": "collector_reference",
+    "Lastschrift Ursprungsbetrag": "original_debit_amount",
+    "Auslagenersatz Ruecklastschrift": "return_debit_expense",
+    "Beguenstigter/Zahlungspflichtiger": "sender_receiver",
+    "Kontonummer/IBAN": "iban",
+    "BIC (SWIFT-Code)": "bic",
+    "Waehrung": "currency",
+    "Info": "info",
+    # Bank_D / New Bank
+    "Wert": "value_date",
+    "Umsatzart": "booking_text",
+    "Begünstigter / Auftraggeber": "sender_receiver",
+    "IBAN / Kontonummer": "iban",
+    "BIC": "bic",
+    "Kundenreferenz": "customer_reference",
+    "Mandatsreferenz": "mandate_reference",
+    "Gläubiger ID": "creditor_id",
+    "Fremde Gebühren": "info",
+    "Abweichender Empfänger": "info",
+    "Anzahl der Aufträge": "info",
+    "Anzahl der Schecks": "info",
+    "Soll": "debit",   # Soll = expenses
+    "Haben": "credit", # Haben = income
+}
+
+@dataclass(frozen=True)
+class BankProfile:
+    """
+    CSV export format of one bank.
+
+    Attributes:
+        name (str): Name of the profile.
+        headers (tuple): Header cells of the export, in file order.
+        date_format (str): strftime format of the booking date.
+        decimal (str): Decimal separator of amounts.
+        thousands (str): Thousands separator of amounts.
+        encoding (str): Encoding of the export.
+        sep (str): Field separator.
+        column_map (dict): Mapping of the bank's header cells to unified column names.
+    """
+    name: str
+    headers: tuple
+    date_format: str = "%d.%m.%Y"
+    decimal: str = ","
+    thousands: str = "."
+    encoding: str = "ISO-8859-1"
+    sep: str = ";"
+    column_map: dict = field(init=False, compare=False, repr=False)
+
+    def __post_init__(self):
+        # Same mapping as the generic path, restricted to this bank's columns,
+        # so both produce the same unified data and transaction hashes.
+        column_map = {h: COLUMN_MAPPING[h] for h in self.headers if h in COLUMN_MAPPING}
+        object.__setattr__(self, "column_map", column_map)
+
+PROFILES = [
+    BankProfile(
+        name="Bank_A",
+        headers=(
+            "Buchung", "Wertstellungsdatum", "Auftraggeber/Empfänger", "Buchungstext",
+            "Verwendungszweck", "Saldo", "Währung", "Betrag", "Währung",
+        ),
+    ),
+    BankProfile(
+        name="Bank_B",
+        headers=(
+            "Buchungstag", "Wertstellungstag", "Buchungstext", "Name Gegenkonto", "GegenIBAN",
+            "Verwendungszweck", "Umsatz", "Währung",
+        ),
+        encoding="utf-8",
+    ),
+    BankProfile(
+        name="Bank_C",
+        headers=(
+            "Auftragskonto", "Buchungstag", "Valutadatum", "Buchungstext", "Verwendungszweck",
+            "Glaeubiger ID", "Mandatsreferenz", "Kundenreferenz (End-to-End)", "Sammlerreferenz",
+            "Lastschrift Ursprungsbetrag", "Auslagenersatz Ruecklastschrift",
+            "Beguenstigter/Zahlungspflichtiger", "Kontonummer/IBAN", "BIC (SWIFT-Code)",
+            "Betrag", "Waehrung", "Info",
+        ),
+        date_format="%d.%m.%y",
+    ),
+    BankProfile(
+        name="Bank_D",
+        headers=(
+            "Buchungstag", "Wert", "Umsatzart", "Begünstigter / Auftraggeber", "Verwendungszweck",
+            "IBAN / Kontonummer", "BIC", "Kundenreferenz", "Mandatsreferenz", "Gläubiger ID",
+            "Fremde Gebühren", "Betrag", "Abweichender Empfänger", "Anzahl der Aufträge",
+            "Anzahl der Schecks", "Soll", "Haben", "Währung",
+        ),
+        encoding="utf-8",
+    ),
+]
+
+# Encodings under which a header is also recognised, after the profile's own encoding
+FALLBACK_ENCODINGS = ["utf-8", "ISO-8859-1"]
+
+def header_fingerprint(cells):
+    """
+    Return the fingerprint of a header line: its stripped, unquoted cells in order.
+
+    The order is part of the fingerprint, so the columns of a matched file are at the
+    positions of the profile's headers.
+
+    Args:
+        cells (iterable): Header cells as str or bytes.
+
+    Returns:
+        tuple: The fingerprint.
+    """
+    return tuple(cell.strip().strip('"' if isinstance(cell, str) else b'"') for cell in cells)
+
+def _build_registry(profiles):
+    """
+    Map (separator, encoded fingerprint) to (profile, encoding) for each profile.
+
+    A header that is encoded to the same bytes under several encodings (e.g. an ASCII
+    header) does not tell the file's encoding, so it is registered with encoding None.
+    """
+    registry = {}
+    for profile in profiles:
+        keys = {}
+        for encoding in [profile.encoding] + FALLBACK_ENCODINGS:
+            try:
+                cells = [h.encode(encoding) for h in profile.headers]
+            except UnicodeEncodeError:
+                continue
+            key = (profile.sep.encode(encoding), header_fingerprint(cells))
+            keys.setdefault(key, set()).add(encoding)
+        for key, encodings in keys.items():
+            registry.setdefault(key, (profile, encodings.pop() if len(encodings) == 1 else None))
+    return registry
+
+_REGISTRY = _build_registry(PROFILES)
+_REGISTRY_SEPARATORS = sorted({sep for sep, _ in _REGISTRY})
+
+def match_header_profile(line):
+    """
+    Look up the bank profile whose header is the given raw line.
+
+    The line is compared as bytes, so no encoding has to be guessed first.
+
+    Args:
+        line (bytes): A raw line of a CSV file.
+
+    Returns:
+        tuple or None: (profile, encoding) if the line is a known header, else None.
+        The encoding is None if the header reads the same in several encodings.
+    """
+    line = line.rstrip(b"\r\n")
+    if line.startswith(b"\xef\xbb\xbf"):
+        line = line[3:]
+    for sep in _REGISTRY_SEPARATORS:
+        match = _REGISTRY.get((sep, header_fingerprint(line.split(sep))))
+        if match:
+            return match
+    return None
@@ -0,0 +1,85 @@
+"""
+db_connection.py
+================
+
+Shared SQLite connection factory for FinTrack.
+
+All scripts open `bank_statements.db` through `connect`, which applies a PRAGMA profile
+tuned for the workload:
+
+- `default`: WAL journal and synchronous=NORMAL for general read/write use.
+- `bulk_load`: larger page cache for importing many rows (used by db_update.py).
+- `analytics`: read-only connection with a large cache and memory map for reports
+  (used by analysis.py).
+
+With WAL, report generation can read the database while an import is writing to it.
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bank_statements.db")
+
+# PRAGMA settings per connection profile. Negative cache_size values are in KiB.
+PRAGMA_PROFILES = {
+    "default": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -64 * 1024,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    "bulk_load": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 30000,
+        "cache_size": -256 * 1024,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    "analytics": {
+        "busy_timeout": 5000,
+        "cache_size": -256 * 1024,
+        "mmap_size": 1024 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+
+# Profiles that only read from the database
+READ_ONLY_PROFILES = {"analytics"}
+
+def connect(db_path=DB_PATH, profile="default", **pragmas):
+    """
+    Open an SQLite connection and apply a PRAGMA profile.
+
+    Read-only profiles open the database with `mode=ro`, so they fail if the
+    database does not exist instead of creating an empty one.
+
+    Args:
+        db_path (str, optional): Path to the SQLite database file.
+        profile (str, optional): Name of the profile in PRAGMA_PROFILES (default is "default").
+        **pragmas: PRAGMA settings overriding those of the profile.
+
+    Returns:
+        sqlite3.Connection: The configured connection.
+
+    Raises:
+        ValueError: If the profile is unknown.
+    """
+    if profile not in PRAGMA_PROFILES:
+        raise ValueError(f"Unknown connection profile: {profile}")
+    settings = {**PRAGMA_PROFILES[profile], **pragmas}
+
+    if profile in READ_ONLY_PROFILES:
+        conn = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(db_path)
+
+    # journal_mode is set first: it changes how the remaining settings take effect
+    if "journal_mode" in settings:
+        conn.execute(f"PRAGMA journal_mode = {settings.pop('journal_mode')}")
+    for name, value in settings.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
@@ -15,79 +15,71 @@ Main features:
 
 Usage:
     Run this script to process all CSV files in the `02_raw_data` directory and update the `bank_statements.db` database.
+    Compressed (`.csv.gz`) and archived (`.zip`) statements are read without unpacking them to disk.
+    Pass `--chunksize [N]` to stream large files in chunks of N rows with bounded memory.
+    Pass `--fast-hash` to use fast 64-bit transaction hashes (only for new databases; a run whose hash mode differs
+    from the stored hashes is refused).
+    Files already imported unchanged are skipped; pass `--force` to re-import them.
+    Pass `--workers [N]` to parse and clean files in N parallel processes.
+    Run with `--migrate` once to convert an existing database to the typed schema.
+    Pass `--staging [DIR]` to also write cleaned transactions to a Parquet staging dataset; files imported
+    before without it are imported again to stage them.
+    Run with `--explain` to print the query plans of the pipeline's queries.
+    Run with `--watch` to keep polling `02_raw_data` and import files as they arrive.
+    Run with `--check-rollup` to rebuild the monthly rollup table and report any drift.
 """
 
 import pandas as pd
-import sqlite3
 import os
-import glob
+import sys
 import logging
 import hashlib
+import re
+import argparse
+import json
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pandas.tseries.api import guess_datetime_format
+
+from bank_profiles import COLUMN_MAPPING, match_header_profile
+from db_connection import DB_PATH, connect
+from inputs import find_inputs, input_name, input_stat, open_input
+from ingest_metrics import METRICS_PATH, log_summary, stage, track_file, write_metrics
+from staging import STAGING_DIR, remove_staged_file, source_id, staged_sources, write_staging
+from rollup import (
+    CATEGORY_TABLE, ROLLUP_TABLE, check_rollup, create_category_table, rebuild_rollup, update_rollup,
+)
 
 # Setup paths
 script_dir = os.path.dirname(os.path.abspath(__file__))
-db_path = os.path.join(script_dir, "bank_statements.db")
+db_path = DB_PATH
 log_path = os.path.join(script_dir, "db_update.log")
+raw_data_dir = os.path.abspath(os.path.join(script_dir, '..', '02_raw_data'))
 
-# Setup logging
-logging.basicConfig(
-    filename=log_path,
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s:%(message)s'
-)
-console = logging.StreamHandler()
-console.setLevel(logging.INFO)
-formatter = logging.Formatter('%(asctime)s %(levelname)s:%(message)s')
-console.setFormatter(formatter)
-logging.getLogger('').addHandler(console)
-
-# Unified column mapping for all banks
-COLUMN_MAPPING = {
-    # Bank_A
-    "Buchung": "date",
-    "Wertstellungsdatum": "value_date",
-    "Auftraggeber/Empfänger": "sender_receiver",
-    "Buchungstext": "booking_text",
-    "Verwendungszweck": "purpose",
-    "Saldo": "balance",
-    "Währung": "currency",
-    "Betrag": "amount",
-    # Bank_B
-    "Buchungstag": "date",
-    "Wertstellungstag": "value_date",
-    "GegenIBAN": "iban",
-    "Name Gegenkonto": "sender_receiver",
-    "Umsatz": "amount",
-    # Bank_C
-    "Auftragskonto": "account_number",
-    "Valutadatum": "value_date",
-    "Glaeubiger ID": "creditor_id",
-    "Mandatsreferenz": "mandate_reference",
-    "Kundenreferenz (End-to-End)": "customer_reference",
-    "Sammlerreferenz": "collector_reference",
-    "Lastschrift Ursprungsbetrag": "original_debit_amount",
-    "Auslagenersatz Ruecklastschrift": "return_debit_expense",
-    "Beguenstigter/Zahlungspflichtiger": "sender_receiver",
-    "Kontonummer/IBAN": "iban",
-    "BIC (SWIFT-Code)": "bic",
-    "Waehrung": "currency",
-    "Info": "info",
-    # Bank_D / New Bank
-    "Wert": "value_date",
-    "Umsatzart": "booking_text",
-    "Begünstigter / Auftraggeber": "sender_receiver",
-    "IBAN / Kontonummer": "iban",
-    "BIC": "bic",
-    "Kundenreferenz": "customer_reference",
-    "Mandatsreferenz": "mandate_reference",
-    "Gläubiger ID": "creditor_id",
-    "Fremde Gebühren": "info",
-    "Abweichender Empfänger": "info",
-    "Anzahl der Aufträge": "info",
-    "Anzahl der Schecks": "info",
-    "Soll": "debit",   # Soll = expenses
-    "Haben": "credit", # Haben = income
-}
+def configure_logging(log_file=log_path):
+    """
+    Log to `db_update.log` and to the console.
+
+    Called when the script is run, so importing the module has no side effects.
+
+    Args:
+        log_file (str, optional): Path of the log file.
+
+    Returns:
+        None
+    """
+    logging.basicConfig(
+        filename=log_file,
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s:%(message)s'
+    )
+    console = logging.StreamHandler()
+    console.setLevel(logging.INFO)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s:%(message)s')
+    console.setFormatter(formatter)
+    logging.getLogger('').addHandler(console)
 
 # All possible unified columns (add more if needed)
 ALL_COLUMNS = [
@@ -99,9 +91,175 @@ ALL_COLUMNS = [
 
 ALL_COLUMNS_WITH_HASH = ALL_COLUMNS + ["transaction_hash"]
 
+NUMERIC_COLUMNS = ["balance", "amount", "debit", "credit", "original_debit_amount", "return_debit_expense"]
+
+# Low-cardinality text columns held as categoricals once the transaction hash is computed
+CATEGORICAL_COLUMNS = ["bank_name", "currency", "booking_text"]
+
+# SQL column types of the transactions table (all other columns are TEXT)
+COLUMN_TYPES = {col: "REAL" for col in NUMERIC_COLUMNS}
+COLUMN_TYPES["transaction_hash"] = "TEXT NOT NULL"
+
+# Version of the transactions table schema, stored in PRAGMA user_version.
+# Version 0 is the legacy schema with every column as TEXT and dates as 'dd.mm.YYYY',
+# version 1 the typed schema. Early databases with the typed schema are stamped 2, so a
+# future schema change must use version 3.
+SCHEMA_VERSION = 1
+
+# Length of the hexadecimal fast 64-bit transaction hashes (--fast-hash)
+FAST_HASH_LENGTH = 16
+
+# Encodings tried in order when reading a CSV file
+ENCODINGS = ['utf-8', 'ISO-8859-1']
+
+# Minimum number of known column names for a line to be taken as the header row
+HEADER_MIN_MATCHES = 5
+
+# Separators tried when detecting the CSV format, and number of bytes inspected
+SEPARATORS = [';', ',', '\t']
+SNIFF_BYTES = 64 * 1024
+
+# Lines in universal newline mode, as bytes
+_LINE_PATTERN = re.compile(rb'[^\r\n]*(?:\r\n|\r|\n)?')
+
+# Default number of rows per chunk in streaming mode
+DEFAULT_CHUNKSIZE = 50_000
+
+# Watch mode: seconds between polls of the raw data folder, and the marker written after each import
+WATCH_INTERVAL = 10
+READY_MARKER = os.path.join(script_dir, "ingest.ready")
+
+# Table recording the CSV files that were already imported
+MANIFEST_TABLE = "ingested_files"
+
+# Secondary indexes of the transactions table, matched to the pipeline's access patterns
+TRANSACTION_INDEXES = {
+    "idx_transactions_date": "date",
+    "idx_transactions_bank_date": "bank_name, date",
+}
+
+# Queries issued by the pipeline, checked by explain_queries: name -> (sql, params)
+PIPELINE_QUERIES = {
+    "duplicate lookup": (
+        "SELECT 1 FROM transactions WHERE transaction_hash = ?", ("",)
+    ),
+    "manifest lookup": (
+        f"SELECT size, mtime, digest FROM {MANIFEST_TABLE} WHERE path = ?", ("",)
+    ),
+    "date range": (
+        "SELECT date, amount, bank_name FROM transactions WHERE date BETWEEN ? AND ?",
+        ("2024-01-01", "2024-12-31"),
+    ),
+    "known hashes": (
+        "SELECT transaction_hash FROM transactions WHERE bank_name = ? AND date BETWEEN ? AND ?",
+        ("Bank_A", "2024-01-01", "2024-12-31"),
+    ),
+    "bank and date range": (
+        "SELECT date, amount FROM transactions WHERE bank_name = ? AND date BETWEEN ? AND ?",
+        ("Bank_A", "2024-01-01", "2024-12-31"),
+    ),
+    "rollup update": (
+        f"SELECT t.date, t.amount, t.bank_name, COALESCE(c.category, '') FROM transactions t "
+        f"LEFT JOIN {CATEGORY_TABLE} c ON c.transaction_hash = t.transaction_hash WHERE t.id > ? AND t.id <= ?",
+        (0, 100),
+    ),
+    # Report (05_analysis): transactions of the selected years and banks, their stored
+    # categories and the summary tables over the monthly rollup
+    "report transactions": (
+        "SELECT date, amount, bank_name, sender_receiver, booking_text, purpose, transaction_hash "
+        "FROM transactions WHERE ((date >= ? AND date < ?)) AND (bank_name IN (?))",
+        ("2024-01-01", "2025-01-01", "Bank_A"),
+    ),
+    "category assignments": (
+        f"SELECT transaction_hash, category, keyword FROM {CATEGORY_TABLE} WHERE rule_version = ?", ("",)
+    ),
+    "missing category assignments": (
+        f"SELECT COUNT(*) FROM transactions t LEFT JOIN {CATEGORY_TABLE} c "
+        "ON c.transaction_hash = t.transaction_hash AND c.rule_version = ? "
+        "WHERE c.transaction_hash IS NULL AND ((t.date >= ? AND t.date < ?)) AND (t.bank_name IN (?))",
+        ("", "2024-01-01", "2025-01-01", "Bank_A"),
+    ),
+    "yearly summary": (
+        f"SELECT year, TOTAL(income), TOTAL(expenditure), TOTAL(net) FROM {ROLLUP_TABLE} "
+        "WHERE year IN (?) AND bank_name IN (?) AND year <> 0 GROUP BY year",
+        (2024, "Bank_A"),
+    ),
+    "category summary": (
+        f"SELECT category, TOTAL(income), TOTAL(expenditure), TOTAL(net) FROM {ROLLUP_TABLE} GROUP BY category", ()
+    ),
+}
+
+# Tables whose size does not grow with the number of transactions (the rollup has one
+# row per month, bank and category), so explain_queries does not flag a scan of them
+SMALL_TABLES = (ROLLUP_TABLE,)
+
+def _transactions_table_sql(table_name):
+    """Return the CREATE TABLE statement of the typed transactions table."""
+    columns_sql = ", ".join([f'"{col}" {COLUMN_TYPES.get(col, "TEXT")}' for col in ALL_COLUMNS_WITH_HASH])
+    return (
+        f'CREATE TABLE IF NOT EXISTS {table_name} ('
+        'id INTEGER PRIMARY KEY, '
+        f'{columns_sql}, '
+        'UNIQUE(transaction_hash)'
+        ');'
+    )
+
+def get_schema_version(db_path, table_name="transactions"):
+    """
+    Return the schema version of the transactions table.
+
+    Args:
+        db_path (str): Path to the SQLite database file.
+        table_name (str, optional): Name of the transactions table.
+
+    Returns:
+        int or None: The schema version (0 for the legacy all-TEXT table),
+        or None if the table does not exist yet.
+    """
+    conn = connect(db_path)
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+        ).fetchone()
+        if not exists:
+            return None
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+def get_hash_compat(db_path, table_name="transactions"):
+    """
+    Return the hash mode of the transaction hashes stored in the database.
+
+    The mode is told by the length of a stored hash, so databases written before the
+    check existed are recognised as well.
+
+    Args:
+        db_path (str): Path to the SQLite database file.
+        table_name (str, optional): Name of the transactions table.
+
+    Returns:
+        bool or None: True for SHA-256 hashes (see row_hash), False for fast 64-bit
+        hashes, or None if no transaction is stored yet.
+    """
+    if not get_schema_version(db_path, table_name):
+        return None
+    conn = connect(db_path)
+    try:
+        row = conn.execute(f"SELECT length(transaction_hash) FROM {table_name} LIMIT 1").fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return row[0] != FAST_HASH_LENGTH
+
 def create_transactions_table(db_path, table_name="transactions"):
     """
-    Create the transactions table with all possible columns and a unique constraint on transaction_hash.
+    Create the transactions table with typed columns, an INTEGER surrogate key
+    and a unique constraint on transaction_hash.
+
+    Amounts are stored as REAL and dates as ISO-8601 text ('YYYY-MM-DD'), so they
+    sort and compare correctly in SQL and need no re-parsing when loaded.
 
     Args:
         db_path (str): Path to the SQLite database file.
@@ -110,108 +268,450 @@ def create_transactions_table(db_path, table_name="transactions"):
     Returns:
         None
     """
-    conn = sqlite3.connect(db_path)
-    columns_sql = ", ".join([f'"{col}" TEXT' for col in ALL_COLUMNS_WITH_HASH])
-    create_sql = (
+    if get_schema_version(db_path, table_name) is not None:
+        return
+    conn = connect(db_path)
+    conn.execute(_transactions_table_sql(table_name))
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+    conn.close()
+
+def migrate_transactions_table(db_path, table_name="transactions"):
+    """
+    Migrate a legacy all-TEXT transactions table to the typed schema in place.
+
+    Dates stored as 'dd.mm.YYYY' are rewritten as 'YYYY-MM-DD' and empty dates as NULL,
+    amount columns are cast to REAL and every row gets an INTEGER id in its original
+    insertion order. transaction_hash values are kept unchanged. The migration runs in
+    one transaction.
+
+    Args:
+        db_path (str): Path to the SQLite database file.
+        table_name (str, optional): Name of the transactions table.
+
+    Returns:
+        None
+    """
+    version = get_schema_version(db_path, table_name)
+    if version is None or version >= SCHEMA_VERSION:
+        logging.info(f"No migration needed for table '{table_name}' in {db_path} (schema version: {version}).")
+        return
+
+    migrated_table = f"{table_name}_migrated"
+    select_columns = []
+    for col in ALL_COLUMNS_WITH_HASH:
+        if col == "date":
+            # Undated rows are stored as NULL, as by an import into the typed schema
+            select_columns.append(
+                "CASE WHEN date LIKE '__.__.____' "
+                "THEN substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2) "
+                "WHEN date = '' THEN NULL "
+                "ELSE date END"
+            )
+        elif col in NUMERIC_COLUMNS:
+            select_columns.append(f'CAST("{col}" AS REAL)')
+        else:
+            select_columns.append(f'"{col}"')
+    columns_sql = ", ".join(f'"{col}"' for col in ALL_COLUMNS_WITH_HASH)
+
+    conn = connect(db_path)
+    try:
+        conn.executescript(
+            "BEGIN;"
+            f"{_transactions_table_sql(migrated_table)}"
+            f"INSERT OR IGNORE INTO {migrated_table} ({columns_sql}) "
+            f"SELECT {', '.join(select_columns)} FROM {table_name} ORDER BY rowid;"
+            f"DROP TABLE {table_name};"
+            f"ALTER TABLE {migrated_table} RENAME TO {table_name};"
+            f"PRAGMA user_version = {SCHEMA_VERSION};"
+            "COMMIT;"
+        )
+        count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        # Transaction ids were renumbered
+        with conn:
+            rebuild_rollup(conn)
+        logging.info(f"Migrated table '{table_name}' in {db_path} to schema version {SCHEMA_VERSION} ({count} rows).")
+    except Exception as e:
+        conn.rollback()
+        logging.error(f"Error migrating table '{table_name}' in {db_path}: {e}")
+        raise
+    finally:
+        conn.close()
+
+def create_indexes(db_path, table_name="transactions"):
+    """
+    Create the secondary indexes of the transactions table if they do not exist yet.
+
+    Args:
+        db_path (str): Path to the SQLite database file.
+        table_name (str, optional): Name of the transactions table.
+
+    Returns:
+        None
+    """
+    conn = connect(db_path)
+    try:
+        for index_name, columns in TRANSACTION_INDEXES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({columns})")
+        # Refresh the query planner statistics where SQLite considers it useful
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+    finally:
+        conn.close()
+
+def explain_queries(db_path, queries=None):
+    """
+    Print the SQLite query plan of the pipeline's queries.
+
+    Plans that scan a whole table (other than the SMALL_TABLES) are flagged, also when
+    the scan reads a covering index instead of the table, so regressions show up before
+    the database grows large.
+
+    Args:
+        db_path (str): Path to the SQLite database file.
+        queries (dict, optional): Mapping of names to (sql, params) tuples
+            (default: PIPELINE_QUERIES).
+
+    Returns:
+        list: Names of the queries that fall back to a full table scan.
+    """
+    queries = queries or PIPELINE_QUERIES
+    full_scans = []
+    conn = connect(db_path)
+    try:
+        for name, (sql, params) in queries.items():
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+            details = [row[-1] for row in plan]
+            # Plans name tables by their alias in the query, if any
+            is_full_scan = any(
+                detail.startswith("SCAN") and detail.split()[1] not in SMALL_TABLES for detail in details
+            )
+            print(f"{name}{'  <-- FULL SCAN' if is_full_scan else ''}")
+            print(f"  {' '.join(sql.split())}")
+            for detail in details:
+                print(f"    {detail}")
+            if is_full_scan:
+                full_scans.append(name)
+    finally:
+        conn.close()
+    return full_scans
+
+def create_manifest_table(db_path, table_name=MANIFEST_TABLE):
+    """
+    Create the manifest table that records which CSV files have already been imported.
+
+    Args:
+        db_path (str): Path to the SQLite database file.
+        table_name (str, optional): Name of the manifest table (default is "ingested_files").
+
+    Returns:
+        None
+    """
+    conn = connect(db_path)
+    conn.execute(
         f'CREATE TABLE IF NOT EXISTS {table_name} ('
-        f'{columns_sql}, '
-        'UNIQUE(transaction_hash)'
+        'path TEXT PRIMARY KEY, '
+        'size INTEGER NOT NULL, '
+        'mtime REAL NOT NULL, '
+        'digest TEXT NOT NULL, '
+        'ingested_at TEXT NOT NULL'
         ');'
     )
-    conn.execute(create_sql)
     conn.commit()
     conn.close()
 
-def find_header_row(file_path, sep=';', encoding='utf-8'):
+def file_digest(file_path, block_size=1 << 20):
     """
-    Find the header row in a CSV file by matching known column names.
+    Compute the SHA-256 digest of a file's content, reading it in blocks.
+
+    The digest of a compressed or archived input is that of its decompressed content.
+
+    Args:
+        file_path (str): Path to the file (see inputs.py for compressed inputs).
+        block_size (int, optional): Number of bytes read per block.
+
+    Returns:
+        str: The SHA-256 digest as a hexadecimal string.
+    """
+    digest = hashlib.sha256()
+    with open_input(file_path) as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def is_file_ingested(file_path, db_path=db_path, table_name=MANIFEST_TABLE):
+    """
+    Check the manifest to see whether a file has already been imported unchanged.
+
+    Size and modification time are compared first, which needs no read of the file.
+    Only if the size matches but the modification time differs (e.g. the file was
+    copied or touched) is the content digest computed and compared.
 
     Args:
         file_path (str): Path to the CSV file.
-        sep (str, optional): CSV separator (default is ';').
-        encoding (str, optional): File encoding (default is 'utf-8').
+        db_path (str, optional): Path to the SQLite database file.
+        table_name (str, optional): Name of the manifest table.
 
     Returns:
-        int: The row index of the header.
+        bool: True if the file is recorded in the manifest with the same content.
+    """
+    path = os.path.abspath(file_path)
+    conn = connect(db_path)
+    try:
+        row = conn.execute(
+            f"SELECT size, mtime, digest FROM {table_name} WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None:
+            return False
+        size, mtime, digest = row
+        stat = input_stat(path)
+        if stat.st_size != size:
+            return False
+        if stat.st_mtime == mtime:
+            return True
+        if file_digest(path) != digest:
+            return False
+        # Same content with a new modification time: remember it for the next run
+        conn.execute(f"UPDATE {table_name} SET mtime = ? WHERE path = ?", (stat.st_mtime, path))
+        conn.commit()
+        return True
+    finally:
+        conn.close()
 
-    Raises:
-        ValueError: If the header row cannot be found.
-    """
-    with open(file_path, 'r', encoding=encoding) as f:
-        for i, line in enumerate(f):
-            headers = [h.strip() for h in line.strip().split(sep)]
-            match_count = sum(1 for h in headers if h in COLUMN_MAPPING)
-            logging.info(f"Line {i} headers: {headers} (matches: {match_count})")
-            if match_count >= 5:  # 5 or more matches is a strong signal
-                logging.info(f"Header row found at line {i} in {file_path}")
-                return i
-    logging.error(f"Header row could not be found in the file: {file_path}")
-    raise ValueError(f"Header row could not be found in the file: {file_path}")
+def is_file_current(file_path, db_path=db_path, staged=None):
+    """
+    Check whether a file can be skipped: it was imported unchanged and, if the staging
+    dataset is written, it has parts in it.
 
-def row_hash(row):
+    Files imported before staging was first enabled have no parts, so they are
+    imported again to stage them (their transactions are known by then).
+
+    Args:
+        file_path (str): Path to the CSV file.
+        db_path (str, optional): Path to the SQLite database file.
+        staged (set, optional): Source ids with staged parts (see staging.staged_sources),
+            or None if the staging dataset is not written.
+
+    Returns:
+        bool: True if the file needs no import.
     """
-    Generate a SHA-256 hash for a row based on all available data.
+    if not is_file_ingested(file_path, db_path=db_path):
+        return False
+    if staged is not None and source_id(file_path) not in staged:
+        logging.info(f"{input_name(file_path)} was imported without staging; importing it again to stage it.")
+        return False
+    return True
+
+def record_ingested_file(file_path, db_path=db_path, table_name=MANIFEST_TABLE):
+    """
+    Record a successfully imported file in the manifest.
 
     Args:
-        row (pandas.Series): A row of transaction data.
+        file_path (str): Path to the CSV file.
+        db_path (str, optional): Path to the SQLite database file.
+        table_name (str, optional): Name of the manifest table.
 
     Returns:
-        str: The SHA-256 hash of the row as a hexadecimal string.
+        None
     """
+    path = os.path.abspath(file_path)
+    stat = input_stat(path)
+    digest = file_digest(path)
+    conn = connect(db_path)
+    try:
+        conn.execute(
+            f"INSERT OR REPLACE INTO {table_name} (path, size, mtime, digest, ingested_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime, digest, datetime.now().isoformat(timespec="seconds"))
+        )
+        conn.commit()
+    finally:
+        conn.close()
 
-    concat = '|'.join([str(row.get(col, '')).strip() for col in ALL_COLUMNS])
-    return hashlib.sha256(concat.encode('utf-8')).hexdigest()
+def _count_header_matches(line, sep):
+    """Return the number of cells in a line that are known column names."""
+    headers = [h.strip().lstrip('\ufeff') for h in line.strip().split(sep)]
+    return sum(1 for h in headers if h in COLUMN_MAPPING)
 
-def load_csv_with_mapping(file_path, bank_name, sep=";"):
+def _first_decoding(head, encodings):
+    """Return the first of `encodings` that decodes the bytes `head`, or None."""
+    for encoding in encodings:
+        try:
+            head.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return None
+
+def detect_csv_format(file_path, sep=None, encodings=ENCODINGS, sniff_bytes=SNIFF_BYTES):
     """
-    Load a CSV file, map its columns to unified names, clean and convert data types,
-    and return a DataFrame ready for database insertion.
+    Detect encoding, separator and header position of a CSV file in a single read.
 
-    Tries UTF-8 encoding first, then falls back to ISO-8859-1.
+    Only the first `sniff_bytes` bytes are read. A line whose fingerprint matches a
+    registered bank profile (see bank_profiles.py) is taken as the header, with the
+    profile's separator and the encoding of the header's bytes (or, if the header reads
+    the same in several encodings, the first encoding that decodes the bytes). Otherwise
+    the first encoding that decodes the bytes is used, and the header is the first line
+    with enough known column names for one of the candidate separators.
 
     Args:
         file_path (str): Path to the CSV file.
-        bank_name (str): Name of the bank (used for the 'bank_name' column).
-        sep (str, optional): CSV separator (default is ';').
+        sep (str, optional): CSV separator. If None, ';', ',' and tab are tried.
+        encodings (list, optional): Encodings to try, in order.
+        sniff_bytes (int, optional): Number of bytes to inspect.
 
     Returns:
-        pandas.DataFrame: DataFrame with unified columns and a transaction_hash column.
+        tuple: (encoding, sep, header_offset, header_row, profile) where header_offset is
+        the byte offset of the header line, header_row its line index and profile the
+        matched BankProfile (or None).
 
     Raises:
-        ValueError: If the file cannot be read with the supported encodings.
+        ValueError: If no encoding decodes the file or the header row cannot be found.
     """
+    with open_input(file_path) as f:
+        head = f.read(sniff_bytes)
+    if len(head) == sniff_bytes:
+        # Only inspect complete lines
+        head = head[:max(head.rfind(b'\n'), head.rfind(b'\r')) + 1]
+    lines = [match for match in _LINE_PATTERN.finditer(head) if match.group()]
+
+    # Known bank formats: one fingerprint lookup per line
+    for i, match in enumerate(lines):
+        profile_match = match_header_profile(match.group())
+        if profile_match is None:
+            continue
+        profile, encoding = profile_match
+        if encoding is None:
+            # The header reads the same in several encodings: decode the content
+            encoding = _first_decoding(head, encodings)
+        if encoding in encodings and sep in (None, profile.sep):
+            logging.info(f"Header row found at line {i} in {file_path} (profile: {profile.name})")
+            return encoding, profile.sep, match.start(), i, profile
 
-    # Try UTF-8 first, then fallback to ISO-8859-1
-    encodings = ['utf-8', 'ISO-8859-1']
     for encoding in encodings:
         try:
-            header_row = find_header_row(file_path, sep=sep, encoding=encoding)
-            df = pd.read_csv(file_path, sep=sep, header=header_row, encoding=encoding)
-            on_bad_lines='skip' 
+            head.decode(encoding)
             break
         except UnicodeDecodeError:
             logging.warning(f"Failed to read {file_path} with encoding {encoding}, trying next encoding.")
-        except Exception as e:
-            logging.error(f"Error reading {file_path} with encoding {encoding}: {e}")
-            raise
     else:
         raise ValueError(f"Could not read {file_path} with tried encodings.")
 
+    separators = [sep] if sep else SEPARATORS
+    for i, match in enumerate(lines):
+        line = match.group().decode(encoding)
+        for candidate in separators:
+            if _count_header_matches(line, candidate) >= HEADER_MIN_MATCHES:
+                logging.info(f"Header row found at line {i} in {file_path} (encoding: {encoding}, separator: {candidate!r})")
+                return encoding, candidate, match.start(), i, None
+
+    logging.error(f"Header row could not be found in the file: {file_path}")
+    raise ValueError(f"Header row could not be found in the file: {file_path}")
+
+def row_hash(row):
+    """
+    Generate a SHA-256 hash for a row based on all available data.
+
+    Args:
+        row (pandas.Series): A row of transaction data.
+
+    Returns:
+        str: The SHA-256 hash of the row as a hexadecimal string.
+    """
+
+    concat = '|'.join([str(row.get(col, '')).strip() for col in ALL_COLUMNS])
+    return hashlib.sha256(concat.encode('utf-8')).hexdigest()
+
+def hash_transactions(df, compat=True):
+    """
+    Generate the transaction hashes for a whole DataFrame at once.
+
+    The ALL_COLUMNS fields are rendered and joined column-wise instead of building a
+    pandas Series per row as `df.apply(row_hash, axis=1)` does. Both modes hash the
+    '|'-joined stripped strings row_hash uses, so a transaction gets the same hash
+    whatever dtype pandas inferred for its columns in a given file.
+
+    Args:
+        df (pandas.DataFrame): DataFrame of transaction data.
+        compat (bool, optional): If True (default), return the SHA-256 hashes produced by
+            row_hash, so they match the transaction_hash values already stored in the
+            database. If False, hash them with pandas' vectorized 64-bit hash instead of
+            SHA-256. This is faster but differs from row_hash, so a database must not
+            mix both kinds.
+
+    Returns:
+        pandas.Series: The transaction hashes as hexadecimal strings.
+    """
+    fields = []
+    for col in ALL_COLUMNS:
+        if col in df.columns:
+            fields.append([str(value).strip() for value in df[col].to_numpy(dtype=object)])
+        else:
+            fields.append([''] * len(df))
+    rows = ['|'.join(values) for values in zip(*fields)]
+
+    if not compat:
+        hashed = pd.util.hash_pandas_object(pd.Series(rows, index=df.index, dtype=object), index=False, categorize=False)
+        return hashed.map('{:016x}'.format)
+
+    hashes = [hashlib.sha256(row.encode('utf-8')).hexdigest() for row in rows]
+    return pd.Series(hashes, index=df.index)
+
+def _parse_profile_dates(values, date_format):
+    """
+    Parse dates with a bank profile's known format.
+
+    Falls back to dayfirst inference if the format does not fit some values,
+    so an unexpected export variant does not lose its dates.
+    """
+    dates = pd.to_datetime(values, errors="coerce", format=date_format)
+    if dates.isna().sum() > values.isna().sum():
+        logging.warning(f"Dates do not match the profile format {date_format!r}, inferring the format instead.")
+        dates = pd.to_datetime(values, errors="coerce", dayfirst=True)
+    return dates
+
+def map_and_clean(df, bank_name, date_format=None, hash_compat=True, profile=None):
+    """
+    Map raw bank columns to unified names, clean and convert data types,
+    and add the transaction_hash column.
+
+    Every step works row by row, so a CSV file can be cleaned as a whole or
+    chunk by chunk with the same result. The hash is computed on the legacy
+    'dd.mm.YYYY' date. The returned frame uses compact dtypes: 'date' is datetime64
+    (stored as 'YYYY-MM-DD' by bulk_insert), amounts are float64 and the
+    CATEGORICAL_COLUMNS are categoricals.
+
+    Args:
+        df (pandas.DataFrame): Raw DataFrame as read from a bank CSV file.
+        bank_name (str): Name of the bank (used for the 'bank_name' column).
+        date_format (str, optional): Explicit strftime format of the 'date' column.
+            If None, the format is inferred with dayfirst=True.
+        hash_compat (bool, optional): Generate hashes compatible with row_hash
+            (see hash_transactions).
+        profile (BankProfile, optional): Matched bank profile. Its column map and date
+            format are used instead of the generic COLUMN_MAPPING and date inference, and
+            numeric columns are expected to be decoded already (see _read_options).
+
+    Returns:
+        pandas.DataFrame: DataFrame with unified columns and a transaction_hash column.
+    """
+    column_map = profile.column_map if profile else COLUMN_MAPPING
     df.columns = [col.strip() for col in df.columns]
 
     # Map columns to unified names
     unified_data = {}
     for col in df.columns:
-        mapped_col = COLUMN_MAPPING.get(col)
+        mapped_col = column_map.get(col)
         if mapped_col:
             unified_data[mapped_col] = df[col]
     unified_df = pd.DataFrame(unified_data)
+    csv_columns = set(unified_df.columns)
 
     # Ensure all columns exist
     for col in ALL_COLUMNS:
         if col not in unified_df.columns:
             # Use 0.0 for numeric, "" for text
-            if col in ["balance", "amount", "debit", "credit", "original_debit_amount", "return_debit_expense"]:
+            if col in NUMERIC_COLUMNS:
                 unified_df[col] = 0.0
             else:
                 unified_df[col] = ""
@@ -219,10 +719,12 @@ def load_csv_with_mapping(file_path, bank_name, sep=";"):
     unified_df["bank_name"] = bank_name
 
     # Convert date column to datetime
-    if "date" in unified_df.columns:
-        unified_df["date"] = pd.to_datetime(
-            unified_df["date"], errors="coerce", dayfirst=True
-        ).dt.strftime("%d.%m.%Y")
+    if profile and not date_format:
+        dates = _parse_profile_dates(unified_df["date"], profile.date_format)
+    else:
+        dates = pd.to_datetime(unified_df["date"], errors="coerce", dayfirst=True, format=date_format)
+    # The transaction hash is defined on the 'dd.mm.YYYY' representation
+    unified_df["date"] = dates.dt.strftime("%d.%m.%Y")
 
     # Clean text columns
     for col in ["sender_receiver", "booking_text", "purpose"]:
@@ -235,8 +737,11 @@ def load_csv_with_mapping(file_path, bank_name, sep=";"):
             )
 
     # Robust numeric conversion for relevant columns
-    for col in ["balance", "amount", "debit", "credit", "original_debit_amount", "return_debit_expense"]:
-        if col in unified_df.columns:
+    for col in NUMERIC_COLUMNS:
+        if profile and col in csv_columns and pd.api.types.is_numeric_dtype(unified_df[col]):
+            # Already decoded by the CSV parser with the bank's separators
+            unified_df[col] = unified_df[col].fillna(0.0)
+        elif col in unified_df.columns:
             unified_df[col] = pd.to_numeric(
                 unified_df[col]
                 .astype(str)
@@ -251,14 +756,315 @@ def load_csv_with_mapping(file_path, bank_name, sep=";"):
             unified_df[col] = unified_df[col].fillna("")
 
     # Generate transaction_hash
-    unified_df["transaction_hash"] = unified_df.apply(row_hash, axis=1)
+    with stage("hash", rows=len(unified_df)):
+        unified_df["transaction_hash"] = hash_transactions(unified_df, compat=hash_compat)
+
+    # Compact dtypes, now that the hash no longer needs the string values
+    unified_df["date"] = dates
+    unified_df = unified_df.astype({col: "category" for col in CATEGORICAL_COLUMNS})
 
-    logging.info(f"Loaded and mapped CSV: {file_path} (bank: {bank_name}), shape: {unified_df.shape}")
     return unified_df[ALL_COLUMNS_WITH_HASH]
 
+def load_csv_with_mapping(file_path, bank_name, sep=None, hash_compat=True):
+    """
+    Load a CSV file, map its columns to unified names, clean and convert data types,
+    and return a DataFrame ready for database insertion.
+
+    Encoding, separator and header row are detected once with detect_csv_format, and
+    pandas reads from the header line onwards. Tries UTF-8 encoding first, then falls
+    back to ISO-8859-1.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        bank_name (str): Name of the bank (used for the 'bank_name' column).
+        sep (str, optional): CSV separator (default: detected).
+        hash_compat (bool, optional): Generate hashes compatible with row_hash
+            (see hash_transactions).
+
+    Returns:
+        pandas.DataFrame: DataFrame with unified columns and a transaction_hash column.
+
+    Raises:
+        ValueError: If the file cannot be read with the supported encodings.
+    """
+
+    # Try UTF-8 first, then fallback to ISO-8859-1
+    encodings = ENCODINGS
+    while True:
+        with stage("detect"):
+            encoding, sep, header_offset, _, profile = detect_csv_format(file_path, sep=sep, encodings=encodings)
+        try:
+            with stage("parse") as counts, open_input(file_path) as f:
+                columns = _header_columns(f, header_offset, sep, encoding)
+                df = pd.read_csv(f, sep=sep, encoding=encoding, **_read_options(profile, columns=columns))
+                counts["rows"] = len(df)
+                counts["bytes"] = f.tell() - header_offset
+            break
+        except UnicodeDecodeError:
+            # The sniffed head decoded fine, but a later part of the file did not
+            logging.warning(f"Failed to read {file_path} with encoding {encoding}, trying next encoding.")
+            encodings = encodings[encodings.index(encoding) + 1:]
+        except Exception as e:
+            logging.error(f"Error reading {file_path} with encoding {encoding}: {e}")
+            raise
+
+    with stage("clean", rows=len(df)):
+        if profile:
+            _infer_text_columns(df, profile)
+        unified_df = map_and_clean(df, bank_name, hash_compat=hash_compat, profile=profile)
+
+    logging.info(f"Loaded and mapped CSV: {file_path} (bank: {bank_name}), shape: {unified_df.shape}")
+    return unified_df
+
+def _seek(f, offset):
+    """Position a binary file at `offset` and return it."""
+    f.seek(offset)
+    return f
+
+def _header_columns(f, header_offset, sep, encoding):
+    """Return the column names pandas reads from the header line at `header_offset` of a binary file."""
+    columns = pd.read_csv(_seek(f, header_offset), sep=sep, encoding=encoding, nrows=0).columns
+    _seek(f, header_offset)
+    return list(columns)
+
+def _is_text_column(profile, col):
+    """Return True if a raw column of a profile maps to a unified text column."""
+    mapped_col = profile.column_map.get(col.strip())
+    return mapped_col is not None and mapped_col not in NUMERIC_COLUMNS
+
+def _read_options(profile=None, dtypes=None, columns=()):
+    """
+    Return the pandas.read_csv options for the mapped columns of a file.
+
+    With a matched bank profile, amounts are decoded by the CSV parser with the bank's
+    decimal and thousands separators, instead of being cast to strings, rewritten and
+    converted in map_and_clean. Text columns are read as text, so that dates and other
+    dotted values are not taken for numbers (see _infer_text_columns).
+
+    Args:
+        profile (BankProfile, optional): Matched bank profile.
+        dtypes (dict, optional): Dtypes pinned by _resolve_chunk_dtypes.
+        columns (list, optional): Column names of the file (see _header_columns), by
+            which the text columns of a profile are read as text.
+
+    Returns:
+        dict: Keyword arguments for pandas.read_csv.
+    """
+    dtypes = dtypes or {}
+    if profile is None:
+        return {"usecols": _mapped_column_filter(), "dtype": dtypes or None}
+    dtype = {col: str for col in columns if _is_text_column(profile, col)}
+    dtype.update({col: kind for col, kind in dtypes.items() if not _is_text_column(profile, col)})
+    return {
+        "usecols": _mapped_column_filter(profile),
+        "dtype": dtype,
+        "decimal": profile.decimal,
+        "thousands": profile.thousands,
+    }
+
+def _is_number(value):
+    """Return True if a value parses as a float."""
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+def _infer_text_columns(df, profile, dtypes=None):
+    """
+    Give the text columns of a frame read with _read_options the dtype pandas infers
+    when reading them without the bank's separators.
+
+    A text column whose values are all numbers is converted, as pandas' parser does,
+    so the unified data and transaction hashes match the generic path.
+
+    Args:
+        df (pandas.DataFrame): Frame read with _read_options(profile).
+        profile (BankProfile): Matched bank profile.
+        dtypes (dict, optional): Dtypes pinned by _resolve_chunk_dtypes.
+
+    Returns:
+        pandas.DataFrame: The frame, modified in place.
+    """
+    dtypes = dtypes or {}
+    for col in df.columns:
+        if not _is_text_column(profile, col) or dtypes.get(col) is str:
+            continue
+        values = df[col]
+        first = values.first_valid_index()
+        if first is None or _is_number(values[first]):
+            converted = pd.to_numeric(values, errors="coerce")
+            if converted.notna().sum() == values.notna().sum():
+                df[col] = converted
+        if dtypes.get(col) == "float64":
+            df[col] = df[col].astype("float64")
+    return df
+
+def _mapped_column_filter(profile=None):
+    """Return a usecols filter keeping the raw CSV columns that map to a unified column."""
+    column_map = profile.column_map if profile else COLUMN_MAPPING
+    return lambda col: col.strip() in column_map
+
+def _resolve_chunk_dtypes(file_path, sep, header_offset, encoding, chunksize, profile=None):
+    """
+    Scan a CSV file chunk by chunk and resolve the dtype pandas would infer for each
+    mapped column when reading the whole file at once.
+
+    Type inference on a single chunk only sees part of a column (e.g. a column that is
+    empty in one chunk is read as float there). Pinning the whole-file dtype keeps
+    chunked cleaning and hashing identical to the single-frame path.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        sep (str): CSV separator.
+        header_offset (int): Byte offset of the header line.
+        encoding (str): File encoding.
+        chunksize (int): Number of rows per chunk.
+        profile (BankProfile, optional): Matched bank profile.
+
+    Returns:
+        tuple: (dtypes, date_format) where dtypes maps raw column names whose type
+        differs between chunks to the dtype to read them with, and date_format is the
+        format inferred from the first non-empty date (or None; always None with a
+        profile, whose own date format is used).
+    """
+    seen = {}
+    date_format = None
+    with open_input(file_path) as f:
+        columns = _header_columns(f, header_offset, sep, encoding)
+        with pd.read_csv(
+            f, sep=sep, encoding=encoding, chunksize=chunksize, **_read_options(profile, columns=columns)
+        ) as reader:
+            for chunk in reader:
+                if profile:
+                    _infer_text_columns(chunk, profile)
+                for col, dtype in chunk.dtypes.items():
+                    seen.setdefault(col, set()).add(dtype)
+                if profile:
+                    continue
+                # Like the column mapping, the last raw column mapped to "date" wins
+                date_cols = [col for col in chunk.columns if COLUMN_MAPPING.get(col.strip()) == "date"]
+                if date_format is None and date_cols:
+                    first = chunk[date_cols[-1]].dropna()
+                    if not first.empty and isinstance(first.iloc[0], str):
+                        date_format = guess_datetime_format(first.iloc[0], dayfirst=True)
+
+    dtypes = {}
+    for col, kinds in seen.items():
+        if len(kinds) == 1:
+            continue
+        if all(pd.api.types.is_numeric_dtype(k) and not pd.api.types.is_bool_dtype(k) for k in kinds):
+            dtypes[col] = "float64"
+        else:
+            dtypes[col] = str
+    return dtypes, date_format
+
+def iter_csv_chunks(file_path, bank_name, sep=None, chunksize=DEFAULT_CHUNKSIZE, hash_compat=True):
+    """
+    Stream a CSV file as cleaned, hashed chunks of at most `chunksize` rows.
+
+    Memory use is bounded by the chunk size instead of the file size. The concatenated
+    chunks are identical to the DataFrame returned by load_csv_with_mapping.
+
+    Encoding, separator and header row are detected once with detect_csv_format, and
+    pandas reads from the header line onwards. Tries UTF-8 encoding first, then falls
+    back to ISO-8859-1.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        bank_name (str): Name of the bank (used for the 'bank_name' column).
+        sep (str, optional): CSV separator (default: detected).
+        chunksize (int, optional): Number of rows per chunk.
+        hash_compat (bool, optional): Generate hashes compatible with row_hash
+            (see hash_transactions).
+
+    Yields:
+        pandas.DataFrame: Chunk with unified columns and a transaction_hash column.
+
+    Raises:
+        ValueError: If the file cannot be read with the supported encodings.
+    """
+    # The dtype scan reads the whole file, so decoding errors surface here,
+    # before any chunk has been handed to the caller.
+    encodings = ENCODINGS
+    while True:
+        with stage("detect"):
+            encoding, sep, header_offset, _, profile = detect_csv_format(file_path, sep=sep, encodings=encodings)
+        try:
+            with stage("resolve"):
+                dtypes, date_format = _resolve_chunk_dtypes(
+                    file_path, sep, header_offset, encoding, chunksize, profile
+                )
+            break
+        except UnicodeDecodeError:
+            logging.warning(f"Failed to read {file_path} with encoding {encoding}, trying next encoding.")
+            encodings = encodings[encodings.index(encoding) + 1:]
+        except Exception as e:
+            logging.error(f"Error reading {file_path} with encoding {encoding}: {e}")
+            raise
+
+    rows = 0
+    with open_input(file_path) as f:
+        columns = _header_columns(f, header_offset, sep, encoding)
+        with pd.read_csv(
+            f, sep=sep, encoding=encoding, chunksize=chunksize, **_read_options(profile, dtypes, columns)
+        ) as reader:
+            chunks = iter(reader)
+            while True:
+                with stage("parse") as counts:
+                    position = f.tell()
+                    chunk = next(chunks, None)
+                    if chunk is not None:
+                        counts["rows"] = len(chunk)
+                        counts["bytes"] = f.tell() - position
+                if chunk is None:
+                    break
+                with stage("clean", rows=len(chunk)):
+                    if profile:
+                        _infer_text_columns(chunk, profile, dtypes)
+                    unified_chunk = map_and_clean(
+                        chunk, bank_name, date_format=date_format, hash_compat=hash_compat, profile=profile
+                    )
+                rows += len(unified_chunk)
+                yield unified_chunk
+    logging.info(f"Streamed and mapped CSV: {file_path} (bank: {bank_name}), rows: {rows}, chunksize: {chunksize}")
+
+def bulk_insert(conn, df, table_name="transactions"):
+    """
+    Insert all rows of a DataFrame with a prepared INSERT OR IGNORE statement.
+
+    Rows are written with executemany inside a single transaction. Rows whose
+    transaction_hash already exists are ignored by SQLite instead of aborting the batch.
+    NaN values are stored as NULL, as with DataFrame.to_sql, and datetime columns as
+    ISO-8601 dates.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        df (pandas.DataFrame): DataFrame to insert; its columns must exist in the table.
+        table_name (str, optional): Name of the table to insert into.
+
+    Returns:
+        tuple: (inserted, skipped) number of rows.
+    """
+    columns = ", ".join(f'"{col}"' for col in df.columns)
+    placeholders = ", ".join("?" for _ in df.columns)
+    insert_sql = f'INSERT OR IGNORE INTO {table_name} ({columns}) VALUES ({placeholders})'
+
+    df = df.assign(**{
+        col: df[col].dt.strftime("%Y-%m-%d")
+        for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])
+    })
+    values = df.astype(object).where(df.notna(), None)
+    before = conn.total_changes
+    with conn:
+        conn.executemany(insert_sql, values.itertuples(index=False, name=None))
+    inserted = conn.total_changes - before
+    return inserted, len(df) - inserted
+
 def save_to_sqlite(df, db_path=db_path, table_name="transactions"):
     """
-    Save the DataFrame into an SQLite database, ignoring duplicates.
+    Save the DataFrame into an SQLite database, ignoring duplicates, and add the
+    new rows to the monthly rollup.
 
     Logs the number of records saved and duplicates skipped.
 
@@ -268,28 +1074,247 @@ def save_to_sqlite(df, db_path=db_path, table_name="transactions"):
         table_name (str, optional): Name of the table to save to.
 
     Returns:
-        None
+        tuple: (inserted, skipped) number of rows.
 
     Raises:
         Exception: If there is an error saving to the database.
     """
 
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path, profile="bulk_load")
     try:
-        before = pd.read_sql_query(f"SELECT COUNT(*) as cnt FROM {table_name}", conn)["cnt"][0]
-        df.to_sql(table_name, conn, if_exists="append", index=False, method="multi")
-        after = pd.read_sql_query(f"SELECT COUNT(*) as cnt FROM {table_name}", conn)["cnt"][0]
-        inserted = after - before
-        skipped = len(df) - inserted
+        with stage("write", rows=len(df)):
+            inserted, skipped = bulk_insert(conn, df, table_name=table_name)
+        with stage("rollup", rows=inserted), conn:
+            update_rollup(conn)
         logging.info(f"Saved {inserted} new records to {db_path} in table '{table_name}'. Skipped {skipped} duplicates.")
-    except sqlite3.IntegrityError as e:
-        logging.info(f"Duplicate entry skipped: {e}")
+        return inserted, skipped
     except Exception as e:
         logging.error(f"Error saving to database: {e}")
         raise
     finally:
         conn.close()
 
+def load_known_hashes(conn, bank_name, date_from, date_to, table_name="transactions"):
+    """
+    Load the hashes of the stored transactions of a bank within a date range.
+
+    The query uses the (bank_name, date) index, so only the overlapping part of the
+    table is read.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        bank_name (str): Name of the bank.
+        date_from (str): First ISO date of the range.
+        date_to (str): Last ISO date of the range.
+        table_name (str, optional): Name of the transactions table.
+
+    Returns:
+        set: The known transaction hashes.
+    """
+    cursor = conn.execute(
+        f"SELECT transaction_hash FROM {table_name} WHERE bank_name = ? AND date BETWEEN ? AND ?",
+        (bank_name, date_from, date_to),
+    )
+    return {transaction_hash for (transaction_hash,) in cursor}
+
+def split_known_transactions(df, db_path=db_path, table_name="transactions"):
+    """
+    Split cleaned transactions into new ones and ones already stored in the database.
+
+    Known hashes are preloaded per bank for the date range of the DataFrame, so rows of
+    overlapping statement exports are dropped before they are sent to the database.
+
+    Args:
+        df (pandas.DataFrame): Cleaned transactions (output of map_and_clean).
+        db_path (str, optional): Path to the SQLite database file.
+        table_name (str, optional): Name of the transactions table.
+
+    Returns:
+        tuple: (new transactions DataFrame, number of known transactions).
+    """
+    dates = df["date"].dropna()
+    if dates.empty:
+        return df, 0
+    date_from, date_to = dates.min().strftime("%Y-%m-%d"), dates.max().strftime("%Y-%m-%d")
+    with stage("dedupe", rows=len(df)):
+        conn = connect(db_path)
+        try:
+            known = set()
+            for bank_name in df["bank_name"].dropna().unique():
+                known |= load_known_hashes(conn, bank_name, date_from, date_to, table_name=table_name)
+        finally:
+            conn.close()
+        is_known = df["transaction_hash"].isin(known)
+    return df[~is_known], int(is_known.sum())
+
+def save_new_transactions(df, db_path=db_path, table_name="transactions"):
+    """
+    Save the transactions of a DataFrame that are not yet stored in the database.
+
+    Args:
+        df (pandas.DataFrame): Cleaned transactions (output of map_and_clean).
+        db_path (str, optional): Path to the SQLite database file.
+        table_name (str, optional): Name of the transactions table.
+
+    Returns:
+        tuple: (new, known) number of transactions. Duplicates within the DataFrame
+        itself are counted as known.
+    """
+    new_df, known = split_known_transactions(df, db_path=db_path, table_name=table_name)
+    if new_df.empty:
+        return 0, known
+    inserted, skipped = save_to_sqlite(new_df, db_path=db_path, table_name=table_name)
+    return inserted, known + skipped
+
+def ingest_file(file_path, bank_name, db_path=db_path, chunksize=None, hash_compat=True, staging_dir=None):
+    """
+    Load, clean and save a single CSV file into the database.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        bank_name (str): Name of the bank (used for the 'bank_name' column).
+        db_path (str, optional): Path to the SQLite database file.
+        chunksize (int, optional): If set, stream the file in chunks of this many rows
+            so memory stays bounded; otherwise load the whole file at once.
+        hash_compat (bool, optional): Generate hashes compatible with row_hash
+            (see hash_transactions).
+        staging_dir (str, optional): If set, also write the cleaned transactions to the
+            Parquet staging dataset in this directory (see staging.py).
+
+    Returns:
+        tuple: (new, known) number of transactions.
+    """
+    if staging_dir:
+        remove_staged_file(file_path, staging_dir=staging_dir)
+    if chunksize:
+        new = known = 0
+        chunks = iter_csv_chunks(file_path, bank_name, chunksize=chunksize, hash_compat=hash_compat)
+        for chunk_index, chunk in enumerate(chunks):
+            chunk_new, chunk_known = save_new_transactions(chunk, db_path=db_path)
+            new += chunk_new
+            known += chunk_known
+            if staging_dir:
+                write_staging(chunk, file_path, chunk_index=chunk_index, staging_dir=staging_dir)
+    else:
+        df = load_csv_with_mapping(file_path, bank_name, hash_compat=hash_compat)
+        new, known = save_new_transactions(df, db_path=db_path)
+        if staging_dir:
+            write_staging(df, file_path, staging_dir=staging_dir)
+    return new, known
+
+def ingest_files(csv_files, db_path=db_path, chunksize=None, hash_compat=True, staging_dir=None,
+                 metrics_path=METRICS_PATH):
+    """
+    Import CSV files one after another, isolating errors per file.
+
+    Args:
+        csv_files (list): Paths of the CSV files to import.
+        db_path (str, optional): Path to the SQLite database file.
+        chunksize (int, optional): Stream each file in chunks of this many rows.
+        hash_compat (bool, optional): Generate hashes compatible with row_hash
+            (see hash_transactions).
+        staging_dir (str, optional): Also write each file to the Parquet staging dataset.
+        metrics_path (str, optional): Append the per-stage metrics of each file to this
+            JSON-lines file and log a summary table (None to disable).
+
+    Returns:
+        dict: (new, known) number of transactions per successfully imported file.
+    """
+    results = {}
+    file_metrics = []
+    for path in csv_files:
+        bank_name = detect_bank_name(path)
+        try:
+            with track_file(path) as metrics:
+                new, known = ingest_file(
+                    path, bank_name, db_path=db_path, chunksize=chunksize,
+                    hash_compat=hash_compat, staging_dir=staging_dir
+                )
+            file_metrics.append(metrics)
+            record_ingested_file(path, db_path=db_path)
+            results[path] = (new, known)
+            logging.info(f"Processed and saved: {input_name(path)} ({new} new, {known} known transactions)")
+        except Exception as e:
+            logging.error(f"Error processing file {path}:\n{e}")
+    if metrics_path and file_metrics:
+        write_metrics(file_metrics, metrics_path)
+        log_summary(file_metrics)
+    return results
+
+def _log_file():
+    """Return the path of the file the root logger writes to, or None."""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.FileHandler):
+            return handler.baseFilename
+    return None
+
+def _init_worker_logging(log_file):
+    """
+    Set up logging in a worker process like in the calling process.
+
+    Workers started with the spawn or forkserver start method do not inherit the
+    calling process's log handlers, so their messages would be lost.
+    """
+    if log_file and not logging.getLogger().handlers:
+        configure_logging(log_file)
+
+def _load_file_with_metrics(file_path, bank_name, hash_compat=True):
+    """Run load_csv_with_mapping in a worker process and return (df, FileMetrics)."""
+    with track_file(file_path) as metrics:
+        df = load_csv_with_mapping(file_path, bank_name, hash_compat=hash_compat)
+    return df, metrics
+
+def ingest_files_parallel(csv_files, db_path=db_path, workers=None, hash_compat=True, staging_dir=None,
+                          metrics_path=METRICS_PATH):
+    """
+    Import CSV files with a process pool and a single database writer.
+
+    Worker processes run load_csv_with_mapping (header detection, parsing, cleaning and
+    hashing) in parallel and log to the same file as the calling process. The calling
+    process is the only one that opens the SQLite database: it saves each finished
+    DataFrame as soon as its worker completes. An error in one file is logged and does
+    not affect the others.
+
+    Args:
+        csv_files (list): Paths of the CSV files to import.
+        db_path (str, optional): Path to the SQLite database file.
+        workers (int, optional): Number of worker processes (default: number of CPUs).
+        hash_compat (bool, optional): Generate hashes compatible with row_hash
+            (see hash_transactions).
+        staging_dir (str, optional): Also write each file to the Parquet staging dataset.
+        metrics_path (str, optional): Append the per-stage metrics of each file to this
+            JSON-lines file and log a summary table (None to disable).
+
+    Returns:
+        dict: (new, known) number of transactions per successfully imported file.
+    """
+    results = {}
+    file_metrics = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker_logging, initargs=(_log_file(),)) as executor:
+        futures = {
+            executor.submit(_load_file_with_metrics, path, detect_bank_name(path), hash_compat=hash_compat): path
+            for path in csv_files
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                df, metrics = future.result()
+                with track_file(path, metrics=metrics):
+                    new, known = save_new_transactions(df, db_path=db_path)
+                    if staging_dir:
+                        remove_staged_file(path, staging_dir=staging_dir)
+                        write_staging(df, path, staging_dir=staging_dir)
+                file_metrics.append(metrics)
+                record_ingested_file(path, db_path=db_path)
+                results[path] = (new, known)
+                logging.info(f"Processed and saved: {input_name(path)} ({new} new, {known} known transactions)")
+            except Exception as e:
+                logging.error(f"Error processing file {path}:\n{e}")
+    if metrics_path and file_metrics:
+        write_metrics(file_metrics, metrics_path)
+        log_summary(file_metrics)
+    return results
+
 def detect_bank_name(filename):
     """
     Extract only the bank name from filename (without extension and year/suffix).
@@ -304,33 +1329,266 @@ def detect_bank_name(filename):
     Returns:
         str: The extracted bank name.
     """
-    base = os.path.splitext(os.path.basename(filename))[0]
+    base = os.path.splitext(input_name(filename))[0]
     # Split at first space, dash, or underscore followed by a year or any non-letter
-    import re
     match = re.match(r"([A-Za-z0-9]+(?:_[A-Za-z0-9]+)*)", base)
     if match:
         return match.group(1)
     return base
 
+def find_csv_files(directory=raw_data_dir):
+    """
+    Return the CSV inputs in a directory: `.csv` and `.csv.gz` files and the CSV
+    files inside `.zip` archives (see inputs.find_inputs).
+
+    Args:
+        directory (str, optional): Directory to search (default: `02_raw_data`).
+
+    Returns:
+        list: Paths of the CSV inputs.
+    """
+    return find_inputs(directory)
+
+def write_ready_marker(results, marker_path=READY_MARKER):
+    """
+    Write the ready marker signalling that new transactions were imported.
+
+    The marker is a JSON file listing the imported files with their new and known
+    transaction counts. It is written to a temporary file and renamed, so readers never
+    see a partial marker.
+
+    Args:
+        results (dict): (new, known) number of transactions per imported file.
+        marker_path (str, optional): Path of the marker file.
+
+    Returns:
+        None
+    """
+    marker = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "files": [
+            {"path": os.path.abspath(path), "new": new, "known": known}
+            for path, (new, known) in results.items()
+        ],
+    }
+    tmp_path = marker_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(marker, f, indent=2)
+    os.replace(tmp_path, marker_path)
+
+def watch_raw_data(directory=raw_data_dir, db_path=db_path, interval=WATCH_INTERVAL, chunksize=None,
+                   hash_compat=True, staging_dir=None, on_ingest=None, marker_path=READY_MARKER, max_polls=None,
+                   workers=1, metrics_path=METRICS_PATH):
+    """
+    Poll a directory and import CSV files as they arrive or change.
+
+    A file is imported once its size and modification time are unchanged between two
+    polls, so files that are still being written are not read half-way. Files already
+    recorded in the manifest (and, with `staging_dir`, staged) are skipped, and a file
+    that failed is retried only after it changes. After each poll that imported files,
+    the ready marker is written and the `on_ingest` command is run, so categorization
+    and analysis can start right away.
+
+    Args:
+        directory (str, optional): Directory to watch (default: `02_raw_data`).
+        db_path (str, optional): Path to the SQLite database file.
+        interval (float, optional): Seconds between polls.
+        chunksize (int, optional): Stream each file in chunks of this many rows.
+        hash_compat (bool, optional): Generate hashes compatible with row_hash
+            (see hash_transactions).
+        staging_dir (str, optional): Also write each file to the Parquet staging dataset.
+        on_ingest (str, optional): Shell command run after each import; the path of the
+            ready marker is passed in the FINTRACK_READY_MARKER environment variable.
+        marker_path (str, optional): Path of the ready marker file.
+        max_polls (int, optional): Stop after this many polls (default: run until interrupted).
+        workers (int, optional): Import the files found by a poll in this many parallel
+            processes (see ingest_files_parallel); `chunksize` then only applies to polls
+            that find a single file.
+        metrics_path (str, optional): Append the per-stage metrics of each file to this
+            JSON-lines file and log a summary table (None to disable).
+
+    Returns:
+        None
+    """
+    logging.info(f"Watching {directory} every {interval}s")
+    previous = {}
+    handled = {}
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        current = {}
+        stable_files = []
+        for path in find_csv_files(directory):
+            try:
+                stat = input_stat(path)
+            except FileNotFoundError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            current[path] = signature
+            if previous.get(path) == signature and handled.get(path) != signature:
+                handled[path] = signature
+                staged = staged_sources(staging_dir) if staging_dir else None
+                if not is_file_current(path, db_path=db_path, staged=staged):
+                    stable_files.append(path)
+        previous = current
+
+        if stable_files:
+            if workers > 1 and len(stable_files) > 1:
+                results = ingest_files_parallel(
+                    stable_files, db_path=db_path, workers=workers,
+                    hash_compat=hash_compat, staging_dir=staging_dir, metrics_path=metrics_path
+                )
+            else:
+                results = ingest_files(
+                    stable_files, db_path=db_path, chunksize=chunksize,
+                    hash_compat=hash_compat, staging_dir=staging_dir, metrics_path=metrics_path
+                )
+            if results:
+                write_ready_marker(results, marker_path=marker_path)
+                if on_ingest:
+                    env = {**os.environ, "FINTRACK_READY_MARKER": marker_path}
+                    completed = subprocess.run(on_ingest, shell=True, env=env)
+                    if completed.returncode != 0:
+                        logging.warning(f"On-ingest command exited with code {completed.returncode}: {on_ingest}")
+
+        polls += 1
+        if max_polls is None or polls < max_polls:
+            time.sleep(interval)
+
 # ---------------------------- MAIN EXECUTION ----------------------------
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import bank statement CSV files into the SQLite database.")
+    parser.add_argument(
+        "--chunksize", type=int, nargs="?", const=DEFAULT_CHUNKSIZE, default=None,
+        help=f"Stream each file in chunks of this many rows (default when given: {DEFAULT_CHUNKSIZE})."
+    )
+    parser.add_argument(
+        "--fast-hash", action="store_true",
+        help="Use fast 64-bit transaction hashes. Refused for a database that already stores hashes of the default mode."
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Re-import all files, even those already recorded as imported."
+    )
+    parser.add_argument(
+        "--workers", type=int, nargs="?", const=os.cpu_count(), default=1,
+        help="Parse and clean files in this many parallel processes (default when given: number of CPUs)."
+    )
+    parser.add_argument(
+        "--staging", nargs="?", const=STAGING_DIR, default=None, metavar="DIR",
+        help=f"Also write cleaned transactions to a Parquet staging dataset (default when given: {STAGING_DIR})."
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="Keep running and import new or changed files in the raw data folder as they arrive."
+    )
+    parser.add_argument(
+        "--interval", type=float, default=WATCH_INTERVAL,
+        help=f"Seconds between polls in watch mode (default: {WATCH_INTERVAL})."
+    )
+    parser.add_argument(
+        "--on-ingest", metavar="COMMAND",
+        help=f"Shell command run after each import in watch mode (the ready marker is written to {READY_MARKER})."
+    )
+    parser.add_argument(
+        "--migrate", action="store_true",
+        help="Migrate an existing database to the typed transactions schema and exit."
+    )
+    parser.add_argument(
+        "--explain", action="store_true",
+        help="Print the query plans of the pipeline's queries and exit (exit code 1 if any uses a full scan)."
+    )
+    parser.add_argument(
+        "--check-rollup", action="store_true",
+        help="Rebuild the monthly rollup from scratch, print the buckets that differed and exit (exit code 1 if any)."
+    )
+    args = parser.parse_args()
+    configure_logging()
+
+    if args.migrate:
+        migrate_transactions_table(db_path)
+        create_indexes(db_path)
+        sys.exit(0)
+    if args.explain:
+        create_transactions_table(db_path)
+        create_manifest_table(db_path)
+        create_indexes(db_path)
+        conn = connect(db_path)
+        try:
+            with conn:
+                create_category_table(conn)
+                update_rollup(conn)
+        finally:
+            conn.close()
+        sys.exit(1 if explain_queries(db_path) else 0)
+    if get_schema_version(db_path) == 0:
+        logging.error(f"{db_path} uses the legacy all-TEXT schema. Run with --migrate first.")
+        sys.exit(1)
+    if args.check_rollup:
+        conn = connect(db_path)
+        try:
+            differing = check_rollup(conn)
+        finally:
+            conn.close()
+        if not differing.empty:
+            print(differing.to_string(index=False))
+        print(f"monthly_rollup: {len(differing)} buckets differed from a rebuild from scratch.")
+        sys.exit(1 if not differing.empty else 0)
+    hash_compat = get_hash_compat(db_path)
+    if hash_compat is not None and hash_compat == args.fast_hash:
+        stored, requested = ("SHA-256", "fast 64-bit") if hash_compat else ("fast 64-bit", "SHA-256")
+        logging.error(
+            f"{db_path} stores {stored} transaction hashes; importing with {requested} hashes would "
+            f"duplicate every transaction. Run {'without' if hash_compat else 'with'} --fast-hash."
+        )
+        sys.exit(1)
+
+    create_transactions_table(db_path)
+    create_manifest_table(db_path)
+    create_indexes(db_path)
+
+    if args.workers > 1 and args.chunksize:
+        logging.warning(
+            "--chunksize is ignored with --workers when several files are imported at once; "
+            "each worker loads whole files."
+        )
+
+    if args.watch:
+        try:
+            watch_raw_data(
+                raw_data_dir, db_path=db_path, interval=args.interval, chunksize=args.chunksize,
+                hash_compat=not args.fast_hash, staging_dir=args.staging, on_ingest=args.on_ingest,
+                workers=args.workers
+            )
+        except KeyboardInterrupt:
+            logging.info("Stopped watching.")
+        sys.exit(0)
+
     # Automatically find all CSV files in the raw data folder
-    raw_data_dir = os.path.abspath(os.path.join(script_dir, '..', '02_raw_data'))
-    csv_files = glob.glob(os.path.join(raw_data_dir, '*.csv')) + glob.glob(os.path.join(raw_data_dir, '*.CSV'))
+    csv_files = find_csv_files(raw_data_dir)
 
     if not csv_files:
         logging.warning(f"No CSV files found in {raw_data_dir}")
     else:
         logging.info(f"Found {len(csv_files)} CSV files in {raw_data_dir}")
 
-    create_transactions_table(db_path)
+    if not args.force:
+        staged = staged_sources(args.staging) if args.staging else None
+        pending_files = []
+        for path in csv_files:
+            if is_file_current(path, db_path=db_path, staged=staged):
+                logging.info(f"Skipped unchanged file: {input_name(path)}")
+            else:
+                pending_files.append(path)
+        csv_files = pending_files
 
-    for path in csv_files:
-        bank_name = detect_bank_name(path)
-        try:
-            df = load_csv_with_mapping(path, bank_name)
-            save_to_sqlite(df, db_path=db_path)
-            logging.info(f"Processed and saved: {os.path.basename(path)}")
-        except Exception as e:
-            logging.error(f"Error processing file {path}:\n{e}")
\ No newline at end of file
+    if args.workers > 1 and len(csv_files) > 1:
+        ingest_files_parallel(
+            csv_files, db_path=db_path, workers=args.workers,
+            hash_compat=not args.fast_hash, staging_dir=args.staging
+        )
+    else:
+        ingest_files(
+            csv_files, db_path=db_path, chunksize=args.chunksize,
+            hash_compat=not args.fast_hash, staging_dir=args.staging
+        )
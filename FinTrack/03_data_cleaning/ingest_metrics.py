@@ -0,0 +1,210 @@
+"""
+ingest_metrics.py
+=================
+
+Per-stage timing and metrics of the CSV import.
+
+db_update.py wraps each imported file in `track_file` and each step of its hot path
+(format detection, parsing, cleaning, hashing, duplicate lookup, database write) in
+`stage`. For every file and stage, the wall time, rows processed, bytes read and the
+increase of the process's peak memory are recorded. The peak memory of a process only
+grows, so a stage that stays below the peak reached by earlier files or stages records
+no increase. Time spent and memory allocated in a nested stage are only counted for the
+inner stage.
+
+The metrics are appended as JSON lines to `db_update_metrics.jsonl`, next to
+`db_update.log`, and summarized in a table at the end of each run. Outside of
+`track_file`, `stage` does nothing, so the instrumented functions can be used on their
+own at no cost.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_update_metrics.jsonl")
+
+# Metrics of the file being imported in the current context
+_current_file = contextvars.ContextVar("current_file", default=None)
+
+def peak_memory_mb():
+    """
+    Return the peak resident memory of the process so far.
+
+    Returns:
+        float: Peak memory in MB, or None where it is not available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1024
+
+def _sum_known(values):
+    """Return the sum of the values that are not None, or None if all are None."""
+    known = [value for value in values if value is not None]
+    return sum(known) if known else None
+
+class FileMetrics:
+    """Metrics of the import of one file, accumulated per stage."""
+
+    def __init__(self, file_path):
+        self.file_path = os.path.abspath(file_path)
+        self.stages = {}
+        self.seconds = 0.0
+        self._stack = []
+
+    def add(self, name, seconds, rows=0, bytes_read=0, peak_increase_mb=None):
+        """Add the measurements of one run of a stage (stages may run once per chunk)."""
+        totals = self.stages.setdefault(
+            name, {"seconds": 0.0, "rows": 0, "bytes": 0, "peak_increase_mb": None}
+        )
+        totals["seconds"] += seconds
+        totals["rows"] += rows
+        totals["bytes"] += bytes_read
+        if peak_increase_mb is not None:
+            totals["peak_increase_mb"] = (totals["peak_increase_mb"] or 0.0) + peak_increase_mb
+
+    def records(self, run):
+        """
+        Return the metrics as JSON-serializable records, one per stage plus a total.
+
+        Args:
+            run (str): Identifier of the run.
+
+        Returns:
+            list: The records.
+        """
+        records = [
+            {"run": run, "file": self.file_path, "stage": name, **totals}
+            for name, totals in self.stages.items()
+        ]
+        records.append({
+            "run": run, "file": self.file_path, "stage": "total", "seconds": self.seconds,
+            "rows": max((totals["rows"] for totals in self.stages.values()), default=0),
+            "bytes": sum(totals["bytes"] for totals in self.stages.values()),
+            "peak_increase_mb": _sum_known(totals["peak_increase_mb"] for totals in self.stages.values()),
+        })
+        return records
+
+@contextmanager
+def track_file(file_path, metrics=None):
+    """
+    Record the stages run while importing a file.
+
+    Args:
+        file_path (str): Path of the imported file.
+        metrics (FileMetrics, optional): Metrics to continue, e.g. those returned by
+            a worker process that parsed the file.
+
+    Yields:
+        FileMetrics: The metrics of the file.
+    """
+    metrics = metrics or FileMetrics(file_path)
+    token = _current_file.set(metrics)
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.seconds += time.perf_counter() - start
+        _current_file.reset(token)
+
+@contextmanager
+def stage(name, rows=0, bytes_read=0):
+    """
+    Time a stage of the import of the current file.
+
+    The yielded dict can be updated with the number of `rows` and `bytes` processed
+    once they are known.
+
+    Args:
+        name (str): Name of the stage.
+        rows (int, optional): Number of rows processed.
+        bytes_read (int, optional): Number of bytes read.
+
+    Yields:
+        dict: The counts of the stage.
+    """
+    counts = {"rows": rows, "bytes": bytes_read}
+    metrics = _current_file.get()
+    if metrics is None:
+        yield counts
+        return
+    # Time and peak memory increase of the stages nested in this one
+    metrics._stack.append([0.0, 0.0])
+    start_peak = peak_memory_mb()
+    start = time.perf_counter()
+    try:
+        yield counts
+    finally:
+        elapsed = time.perf_counter() - start
+        increase = peak_memory_mb() - start_peak if start_peak is not None else None
+        nested_seconds, nested_increase = metrics._stack.pop()
+        if metrics._stack:
+            metrics._stack[-1][0] += elapsed
+            if increase is not None:
+                metrics._stack[-1][1] += increase
+        metrics.add(
+            name, elapsed - nested_seconds, counts["rows"], counts["bytes"],
+            increase - nested_increase if increase is not None else None,
+        )
+
+def write_metrics(file_metrics, metrics_path=METRICS_PATH):
+    """
+    Append the metrics of a run to a JSON-lines file.
+
+    Args:
+        file_metrics (list): FileMetrics of the imported files.
+        metrics_path (str, optional): Path of the JSON-lines file.
+
+    Returns:
+        None
+    """
+    run = datetime.now().isoformat(timespec="seconds")
+    with open(metrics_path, "a", encoding="utf-8") as f:
+        for metrics in file_metrics:
+            for record in metrics.records(run):
+                f.write(json.dumps(record) + "\n")
+
+def log_summary(file_metrics):
+    """
+    Log a table of the time, rows, throughput and bytes per stage over all files.
+
+    Args:
+        file_metrics (list): FileMetrics of the imported files.
+
+    Returns:
+        None
+    """
+    if not file_metrics:
+        return
+    totals = {}
+    for metrics in file_metrics:
+        for name, values in metrics.stages.items():
+            total = totals.setdefault(name, {"seconds": 0.0, "rows": 0, "bytes": 0})
+            for key in total:
+                total[key] += values[key]
+    wall = sum(metrics.seconds for metrics in file_metrics)
+
+    lines = [f"{'stage':<12}{'seconds':>10}{'share':>8}{'rows':>12}{'rows/s':>12}{'MB read':>10}"]
+    for name, total in totals.items():
+        rate = total["rows"] / total["seconds"] if total["seconds"] else 0
+        share = total["seconds"] / wall if wall else 0
+        lines.append(
+            f"{name:<12}{total['seconds']:>10.3f}{share:>8.1%}{total['rows']:>12,}"
+            f"{rate:>12,.0f}{total['bytes'] / 1e6:>10.1f}"
+        )
+    peak = peak_memory_mb()
+    lines.append(f"{'total':<12}{wall:>10.3f}  files: {len(file_metrics)}, process peak memory: "
+                 + (f"{peak:.0f} MB" if peak is not None else "n/a"))
+    logging.info("Import metrics per stage:\n" + "\n".join(lines))
@@ -0,0 +1,126 @@
+"""
+inputs.py
+=========
+
+Discovery and streaming of statement inputs: plain CSV files, gzip-compressed CSV files
+and CSV files inside ZIP archives.
+
+An input is identified by a path string. A CSV file inside a ZIP archive is addressed as
+`<archive path>::<member name>`, e.g. `02_raw_data/2023.zip::Bank_A-2023.csv`.
+`open_input` returns a binary file object that decompresses on the fly, so compressed
+statements are read by the header detector and the CSV parser without temporary files.
+"""
+
+import glob
+import gzip
+import logging
+import os
+import zipfile
+
+# Separator between an archive path and the name of a member
+MEMBER_SEP = "::"
+
+CSV_EXTENSIONS = (".csv",)
+GZIP_EXTENSIONS = (".csv.gz",)
+ZIP_EXTENSIONS = (".zip",)
+
+def split_input(path):
+    """
+    Split an input path into the path of the file on disk and the archive member.
+
+    Args:
+        path (str): Input path.
+
+    Returns:
+        tuple: (file path, member name or None).
+    """
+    if MEMBER_SEP in path:
+        archive, member = path.rsplit(MEMBER_SEP, 1)
+        return archive, member
+    return path, None
+
+def open_input(path):
+    """
+    Open an input for binary reading, decompressing gzip files and archive members.
+
+    The returned file object supports tell() and forward seek(), which decompress up to
+    the requested position.
+
+    Args:
+        path (str): Input path.
+
+    Returns:
+        file object: The decompressed content of the input.
+    """
+    file_path, member = split_input(path)
+    if member is not None:
+        # The member stays readable after the archive is closed; its file handle is
+        # released when the member is closed
+        with zipfile.ZipFile(file_path) as archive:
+            return archive.open(member)
+    if file_path.lower().endswith(GZIP_EXTENSIONS):
+        return gzip.open(file_path, "rb")
+    return open(file_path, "rb")
+
+def input_stat(path):
+    """Return the os.stat_result of the file on disk holding an input."""
+    return os.stat(split_input(path)[0])
+
+def input_name(path):
+    """
+    Return the file name of an input's CSV content, e.g. 'Bank_A-2023.csv' for
+    '2023.zip::Bank_A-2023.csv' or 'Bank_A-2023.csv.gz'.
+    """
+    file_path, member = split_input(path)
+    name = os.path.basename(member if member is not None else file_path)
+    if name.lower().endswith(".gz"):
+        name = name[:-3]
+    return name
+
+def input_stem(path):
+    """
+    Return a name identifying an input among all inputs, without extensions.
+
+    Archive members are prefixed with the archive's name, since archives may contain
+    members with the same name.
+    """
+    file_path, member = split_input(path)
+    stem = os.path.splitext(input_name(path))[0]
+    if member is not None:
+        stem = f"{os.path.splitext(os.path.basename(file_path))[0]}-{stem}"
+    return stem
+
+def _has_extension(path, extensions):
+    return path.lower().endswith(extensions)
+
+def find_inputs(directory):
+    """
+    Return the CSV inputs in a directory: CSV files, gzip-compressed CSV files and the
+    CSV members of ZIP archives.
+
+    Archives that cannot be read (e.g. still being copied) are skipped with a warning.
+
+    Args:
+        directory (str): Directory to search.
+
+    Returns:
+        list: Input paths, sorted.
+    """
+    inputs = []
+    for path in sorted(glob.glob(os.path.join(glob.escape(directory), "*"))):
+        if not os.path.isfile(path):
+            continue
+        if _has_extension(path, CSV_EXTENSIONS + GZIP_EXTENSIONS):
+            inputs.append(path)
+        elif _has_extension(path, ZIP_EXTENSIONS):
+            try:
+                with zipfile.ZipFile(path) as archive:
+                    members = archive.namelist()
+            except (zipfile.BadZipFile, OSError) as e:
+                logging.warning(f"Skipped unreadable archive {path}: {e}")
+                continue
+            inputs.extend(
+                f"{path}{MEMBER_SEP}{member}" for member in members
+                if _has_extension(member, CSV_EXTENSIONS) and not member.startswith("__MACOSX/")
+            )
+    return inputs
@@ -0,0 +1,291 @@
+"""
+rollup.py
+=========
+
+Materialized monthly totals of the transactions.
+
+The `monthly_rollup` table holds the income, expenditure, net balance and number of
+transactions per year, month, bank and category. It is maintained incrementally:
+
+- db_update.py adds the transactions inserted since the last update. A watermark in
+  `monthly_rollup_state` records the last transaction id included, so transactions
+  inserted by an interrupted run are picked up by the next update.
+- When transactions are (re)categorized (analysis.py, category_store), their amounts
+  are moved from their previous category to the new one.
+
+Transactions without a category assignment are counted under the category ''.
+Transactions without a valid date are counted under year and month 0, so they are
+included in the per-category totals but can be left out of the yearly and monthly
+ones, as in the report. check_rollup rebuilds the table from scratch and reports the
+buckets that differed.
+"""
+
+import logging
+import sqlite3
+
+import pandas as pd
+
+ROLLUP_TABLE = "monthly_rollup"
+ROLLUP_STATE_TABLE = "monthly_rollup_state"
+
+# Version of the rollup's contents, stored with the watermark. A rollup of another
+# version is rebuilt on the next update. Version 1 left out undated transactions.
+ROLLUP_VERSION = 2
+
+# Table of category assignments, written by analysis.py (05_analysis/category_store.py)
+CATEGORY_TABLE = "transaction_categories"
+
+# Category of transactions that have no assignment yet
+UNCATEGORIZED = ""
+
+# Year and month of transactions without a valid date
+UNDATED = 0
+
+ROLLUP_KEYS = ["year", "month", "bank_name", "category"]
+ROLLUP_VALUES = ["income", "expenditure", "net", "transactions"]
+
+# Largest accepted absolute difference between stored and rebuilt sums
+ROLLUP_TOLERANCE = 1e-6
+
+def _table_exists(conn, table_name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+    ).fetchone() is not None
+
+def _stored_category(conn):
+    """
+    Return the JOIN clause and expression giving the stored category of transactions `t`.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+
+    Returns:
+        tuple: (JOIN clause, category SQL expression).
+    """
+    if not _table_exists(conn, CATEGORY_TABLE):
+        return "", f"'{UNCATEGORIZED}'"
+    return (
+        f"LEFT JOIN {CATEGORY_TABLE} c ON c.transaction_hash = t.transaction_hash",
+        f"COALESCE(c.category, '{UNCATEGORIZED}')",
+    )
+
+def _rollup_select(category_sql, sign=1, joins="", where="1"):
+    """
+    Return a SELECT of rollup rows over transactions `t`, grouped by the rollup keys.
+
+    Args:
+        category_sql (str): Category expression.
+        sign (int, optional): 1 to add the amounts, -1 to subtract them.
+        joins (str, optional): JOIN clauses.
+        where (str, optional): Condition on the transactions.
+
+    Returns:
+        str: The SQL query.
+    """
+    return (
+        "SELECT "
+        f"COALESCE(CAST(strftime('%Y', t.date) AS INTEGER), {UNDATED}) AS year, "
+        f"COALESCE(CAST(strftime('%m', t.date) AS INTEGER), {UNDATED}) AS month, "
+        "COALESCE(t.bank_name, '') AS bank_name, "
+        f"{category_sql} AS category, "
+        f"{sign} * TOTAL(CASE WHEN t.amount > 0 THEN t.amount ELSE 0 END) AS income, "
+        f"{sign} * TOTAL(CASE WHEN t.amount < 0 THEN t.amount ELSE 0 END) AS expenditure, "
+        f"{sign} * TOTAL(t.amount) AS net, "
+        f"{sign} * COUNT(*) AS transactions "
+        f"FROM transactions t {joins} "
+        f"WHERE {where} "
+        "GROUP BY 1, 2, 3, 4"
+    )
+
+def _add_to_rollup(conn, select_sql, params=(), table_name=ROLLUP_TABLE):
+    """Add the rows of a rollup SELECT to the rollup table, summing into existing buckets."""
+    conn.execute(
+        f"INSERT INTO {table_name} ({', '.join(ROLLUP_KEYS + ROLLUP_VALUES)}) {select_sql} "
+        f"ON CONFLICT ({', '.join(ROLLUP_KEYS)}) DO UPDATE SET "
+        + ", ".join(f"{col} = {col} + excluded.{col}" for col in ROLLUP_VALUES),
+        params,
+    )
+    conn.execute(f"DELETE FROM {table_name} WHERE transactions = 0")
+
+def create_category_table(conn, table_name=CATEGORY_TABLE):
+    """
+    Create the table of category assignments and its indexes if they do not exist yet.
+
+    The rule_version index serves the lookup of the assignments of the current rules.
+
+    Args:
+        conn (sqlite3.Connection): Open connection to the database.
+        table_name (str, optional): Name of the table.
+
+    Returns:
+        None
+    """
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS {table_name} ('
+        'transaction_hash TEXT PRIMARY KEY, '
+        'category TEXT NOT NULL, '
+        'keyword TEXT, '
+        'rule_version TEXT NOT NULL'
+        ');'
+    )
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_category ON {table_name} (category)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_rule_version ON {table_name} (rule_version)")
+
+def _create_rollup_table(conn, table_name=ROLLUP_TABLE):
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS {table_name} ('
+        'year INTEGER NOT NULL, '
+        'month INTEGER NOT NULL, '
+        'bank_name TEXT NOT NULL, '
+        'category TEXT NOT NULL, '
+        'income REAL NOT NULL, '
+        'expenditure REAL NOT NULL, '
+        'net REAL NOT NULL, '
+        'transactions INTEGER NOT NULL, '
+        'PRIMARY KEY (year, month, bank_name, category)'
+        ');'
+    )
+
+def _set_watermark(conn, last_id):
+    conn.execute(
+        f"INSERT OR REPLACE INTO {ROLLUP_STATE_TABLE} (id, last_transaction_id, version) VALUES (0, ?, ?)",
+        (last_id, ROLLUP_VERSION),
+    )
+
+def get_watermark(conn):
+    """
+    Return the id of the last transaction included in the rollup.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+
+    Returns:
+        int or None: The transaction id, or None if the rollup does not exist yet or
+        is of another ROLLUP_VERSION.
+    """
+    if not _table_exists(conn, ROLLUP_STATE_TABLE):
+        return None
+    try:
+        row = conn.execute(
+            f"SELECT last_transaction_id FROM {ROLLUP_STATE_TABLE} WHERE id = 0 AND version = ?", (ROLLUP_VERSION,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # State table of version 1, without a version column
+        return None
+    return row[0] if row else None
+
+def rebuild_rollup(conn):
+    """
+    Rebuild the rollup table from all transactions and their stored assignments.
+
+    Runs in the caller's transaction; commit to make it permanent.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+
+    Returns:
+        None
+    """
+    _create_rollup_table(conn)
+    conn.execute(f"DROP TABLE IF EXISTS {ROLLUP_STATE_TABLE}")
+    conn.execute(
+        f"CREATE TABLE {ROLLUP_STATE_TABLE} ("
+        "id INTEGER PRIMARY KEY CHECK (id = 0), last_transaction_id INTEGER NOT NULL, version INTEGER NOT NULL)"
+    )
+    conn.execute(f"DELETE FROM {ROLLUP_TABLE}")
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+    joins, category_sql = _stored_category(conn)
+    _add_to_rollup(conn, _rollup_select(category_sql, joins=joins, where="t.id <= ?"), (last_id,))
+    _set_watermark(conn, last_id)
+
+def update_rollup(conn):
+    """
+    Add the transactions inserted since the last update to the rollup.
+
+    Creates and fills the rollup on first use, and rebuilds a rollup of another
+    ROLLUP_VERSION. Runs in the caller's transaction.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+
+    Returns:
+        int: Number of transactions added.
+    """
+    last_id = get_watermark(conn)
+    if last_id is None:
+        rebuild_rollup(conn)
+        return conn.execute(f"SELECT COALESCE(SUM(transactions), 0) FROM {ROLLUP_TABLE}").fetchone()[0]
+    new_last_id, added = conn.execute(
+        "SELECT COALESCE(MAX(id), ?), COUNT(*) FROM transactions WHERE id > ?", (last_id, last_id)
+    ).fetchone()
+    if added:
+        joins, category_sql = _stored_category(conn)
+        _add_to_rollup(
+            conn, _rollup_select(category_sql, joins=joins, where="t.id > ? AND t.id <= ?"), (last_id, new_last_id)
+        )
+        _set_watermark(conn, new_last_id)
+    return added
+
+def apply_category_changes(conn, assignments):
+    """
+    Move the amounts of recategorized transactions to their new categories in the rollup.
+
+    Must be called, in the same transaction, before the new assignments replace the
+    stored ones. Transactions not yet included in the rollup are left to update_rollup.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        assignments (pandas.DataFrame): 'transaction_hash' and new 'category' columns.
+
+    Returns:
+        None
+    """
+    update_rollup(conn)
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS rollup_changes (transaction_hash TEXT PRIMARY KEY, category TEXT NOT NULL)")
+    conn.execute("DELETE FROM rollup_changes")
+    conn.executemany(
+        "INSERT OR REPLACE INTO rollup_changes (transaction_hash, category) VALUES (?, ?)",
+        zip(assignments["transaction_hash"], assignments["category"]),
+    )
+    stored_joins, previous_sql = _stored_category(conn)
+    joins = f"JOIN rollup_changes r ON r.transaction_hash = t.transaction_hash {stored_joins}"
+    where = f"t.id <= ? AND r.category IS NOT {previous_sql}"
+    last_id = get_watermark(conn)
+    # Subtract from the previous categories, then add to the new ones
+    _add_to_rollup(conn, _rollup_select(previous_sql, sign=-1, joins=joins, where=where), (last_id,))
+    _add_to_rollup(conn, _rollup_select("r.category", joins=joins, where=where), (last_id,))
+    conn.execute("DELETE FROM rollup_changes")
+
+def load_rollup(conn):
+    """Return the rollup table as a DataFrame sorted by its keys."""
+    return pd.read_sql_query(
+        f"SELECT {', '.join(ROLLUP_KEYS + ROLLUP_VALUES)} FROM {ROLLUP_TABLE} ORDER BY {', '.join(ROLLUP_KEYS)}", conn
+    )
+
+def check_rollup(conn, tolerance=ROLLUP_TOLERANCE):
+    """
+    Rebuild the rollup from scratch and return the buckets that differed.
+
+    The rebuilt table replaces the stored one.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        tolerance (float, optional): Largest accepted absolute difference between sums.
+
+    Returns:
+        pandas.DataFrame: The differing buckets, with the stored and rebuilt values
+        ('<column>_stored', '<column>_rebuilt'); empty if the rollup was consistent.
+    """
+    stored = load_rollup(conn) if _table_exists(conn, ROLLUP_TABLE) else pd.DataFrame(columns=ROLLUP_KEYS + ROLLUP_VALUES)
+    with conn:
+        rebuild_rollup(conn)
+    rebuilt = load_rollup(conn)
+
+    diff = stored.merge(rebuilt, on=ROLLUP_KEYS, how="outer", suffixes=("_stored", "_rebuilt"))
+    values = diff[[f"{col}_{side}" for col in ROLLUP_VALUES for side in ("stored", "rebuilt")]].astype(float).fillna(0)
+    differs = pd.Series(False, index=diff.index)
+    for col in ROLLUP_VALUES:
+        differs |= (values[f"{col}_stored"] - values[f"{col}_rebuilt"]).abs() > tolerance
+    differing = diff[differs].reset_index(drop=True)
+    logging.info(f"Rebuilt {ROLLUP_TABLE}: {len(rebuilt)} buckets, {len(differing)} differed from the stored table.")
+    return differing
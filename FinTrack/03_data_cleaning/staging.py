@@ -0,0 +1,196 @@
+"""
+staging.py
+==========
+
+Columnar staging store for cleaned transactions.
+
+Besides the SQLite database, db_update.py can write the cleaned transactions of each
+imported file to a Parquet dataset, partitioned by year and bank::
+
+    staging/year=2024/bank_name=Bank_A/<file>.<source id>-<chunk>-0.parquet
+
+Columns are stored with their types (dates as dates, amounts as float64), so reports read
+them back without parsing. load_staging reads only the requested columns and skips the
+partitions that do not match the requested years and banks.
+
+Requires the optional `pyarrow` package.
+"""
+
+import glob
+import hashlib
+import logging
+import os
+
+import pandas as pd
+
+from ingest_metrics import stage
+from inputs import input_name, input_stem
+
+STAGING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "staging")
+
+# Partition columns, outermost first
+PARTITION_COLUMNS = ["year", "bank_name"]
+
+def _require_pyarrow():
+    """
+    Import pyarrow and its dataset module.
+
+    Returns:
+        tuple: The `pyarrow` and `pyarrow.dataset` modules.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError as e:
+        raise ImportError("The Parquet staging store requires pyarrow (pip install pyarrow).") from e
+    return pa, ds
+
+def source_id(file_path):
+    """
+    Return the identifier of a source file in the names of its Parquet parts.
+
+    Part names start with the source's stem, which may be the prefix of other sources'
+    stems (e.g. 'Bank_A' and 'Bank_A-2020'), so they also carry a fixed-length hash of
+    the stem that tells the sources apart.
+
+    Args:
+        file_path (str): Path of the source CSV file.
+
+    Returns:
+        str: '<stem>.<12 hex digits>'.
+    """
+    stem = input_stem(file_path)
+    return f"{stem}.{hashlib.sha1(stem.encode('utf-8')).hexdigest()[:12]}"
+
+def remove_staged_file(file_path, staging_dir=STAGING_DIR):
+    """
+    Remove the Parquet parts written for a source file, e.g. before it is re-imported.
+
+    Args:
+        file_path (str): Path of the source CSV file.
+        staging_dir (str, optional): Root directory of the staging dataset.
+
+    Returns:
+        int: Number of removed parts.
+    """
+    pattern = os.path.join(glob.escape(staging_dir), "**", f"{glob.escape(source_id(file_path))}-*.parquet")
+    parts = glob.glob(pattern, recursive=True)
+    for part in parts:
+        os.remove(part)
+    return len(parts)
+
+def write_staging(df, file_path, chunk_index=0, staging_dir=STAGING_DIR):
+    """
+    Write cleaned transactions to the staging dataset.
+
+    Dates are stored as dates and a `year` partition column is derived from them.
+    Parts are named after the source file (see source_id) and chunk, so re-importing a
+    file replaces its parts instead of adding new ones.
+
+    Args:
+        df (pandas.DataFrame): Cleaned transactions (output of map_and_clean).
+        file_path (str): Path of the source CSV file.
+        chunk_index (int, optional): Index of the chunk when a file is streamed in chunks.
+        staging_dir (str, optional): Root directory of the staging dataset.
+
+    Returns:
+        None
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    pa, ds = _require_pyarrow()
+    if df.empty:
+        return
+    with stage("staging", rows=len(df)):
+        staged = df.copy()
+        staged["date"] = pd.to_datetime(staged["date"], format="ISO8601", errors="coerce")
+        staged["year"] = staged["date"].dt.year.fillna(0).astype("int32")
+        staged["date"] = staged["date"].dt.date
+        # All parts must share one schema to be read back as one dataset, so text columns
+        # are stored as plain strings whatever dtype the CSV parser inferred for them: an
+        # IBAN column may be read as integers from one file and as text from another, and
+        # categoricals would be written as dictionary columns whose index width depends on
+        # each part's number of categories
+        text_columns = [
+            col for col in staged.columns
+            if col not in ("date", "year") and not pd.api.types.is_float_dtype(staged[col])
+        ]
+        staged[text_columns] = staged[text_columns].astype(str)
+
+        table = pa.Table.from_pandas(staged, preserve_index=False)
+        ds.write_dataset(
+            table,
+            staging_dir,
+            format="parquet",
+            partitioning=PARTITION_COLUMNS,
+            partitioning_flavor="hive",
+            basename_template=f"{source_id(file_path)}-{chunk_index}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+    logging.info(f"Staged {len(staged)} rows from {input_name(file_path)} in {staging_dir}")
+
+def staged_sources(staging_dir=STAGING_DIR):
+    """
+    Return the source files that have parts in the staging dataset.
+
+    Args:
+        staging_dir (str, optional): Root directory of the staging dataset.
+
+    Returns:
+        set: The source_id of each staged source file.
+    """
+    parts = glob.glob(os.path.join(glob.escape(staging_dir), "**", "*.parquet"), recursive=True)
+    # Part names are '<source id>-<chunk>-<i>.parquet'
+    return {os.path.basename(part).rsplit("-", 2)[0] for part in parts}
+
+def staging_exists(staging_dir=STAGING_DIR):
+    """Return True if the staging dataset contains at least one Parquet part."""
+    return bool(glob.glob(os.path.join(glob.escape(staging_dir), "**", "*.parquet"), recursive=True))
+
+def load_staging(columns=None, years=None, banks=None, staging_dir=STAGING_DIR):
+    """
+    Load transactions from the staging dataset.
+
+    Only the requested columns are read, and partitions outside the requested years
+    and banks are skipped without being opened. Transactions staged from several
+    overlapping statement files are kept once, as in the database.
+
+    Args:
+        columns (list, optional): Columns to load (default: all columns).
+        years (list, optional): Only load these years.
+        banks (list, optional): Only load these banks.
+        staging_dir (str, optional): Root directory of the staging dataset.
+
+    Returns:
+        pandas.DataFrame: The transactions, with `date` as datetime64 and categorical
+        columns as strings.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    _, ds = _require_pyarrow()
+    dataset = ds.dataset(staging_dir, format="parquet", partitioning="hive")
+
+    row_filter = None
+    if years is not None:
+        row_filter = ds.field("year").isin([int(year) for year in years])
+    if banks is not None:
+        bank_filter = ds.field("bank_name").isin(list(banks))
+        row_filter = bank_filter if row_filter is None else row_filter & bank_filter
+
+    read_columns = None
+    if columns is not None:
+        read_columns = list(dict.fromkeys([*columns, "transaction_hash"]))
+    table = dataset.to_table(columns=read_columns, filter=row_filter)
+
+    df = table.to_pandas().drop_duplicates(subset="transaction_hash", ignore_index=True)
+    if columns is not None:
+        df = df[list(columns)]
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"])
+    logging.info(f"Loaded {len(df)} transactions from staging dataset {staging_dir}")
+    return df
@@ -0,0 +1,217 @@
+"""
+aggregations.py
+
+Aggregations behind the report's summary tables.
+
+The yearly, monthly and category sums of income, expenditure and net balance, and the
+expenditure per category and year or month, are computed by GROUP BY queries inside
+SQLite over the `monthly_rollup` table (see 03_data_cleaning/rollup.py), which is kept
+up to date by the import and by category_store. Only the small result frames are loaded
+into pandas.
+
+Transactions without a valid date are counted in the category table only, as in the
+report before the aggregations moved to SQL.
+
+The same tables can be computed from a DataFrame of transactions (pandas fallback), e.g.
+for the staging dataset or when the assignments could not be stored. verify_aggregations
+compares both.
+"""
+
+import logging
+
+import pandas as pd
+
+from category_store import CATEGORY_TABLE
+from db_connection import connect
+from rollup import ROLLUP_TABLE, UNDATED, get_watermark
+
+# Summary columns: name -> SQL expression over the monthly rollup
+SUMMARY_COLUMNS = {
+    "Total_Income": "TOTAL(income)",
+    "Total_Expenditure": "TOTAL(expenditure)",
+    "Net_Balance": "TOTAL(net)",
+}
+
+# Grouping keys of the summary tables: table name -> key columns. Tables grouped by
+# year or month leave out undated transactions.
+SUMMARY_KEYS = {
+    "yearly": ["year"],
+    "monthly": ["year", "month"],
+    "category": ["category"],
+}
+
+# Expenditure pivots: table name -> column of the pivot
+EXPENSE_PIVOTS = {
+    "yearly_expenses": "year",
+    "monthly_expenses": "month",
+}
+
+def transaction_filter(years=None, banks=None, alias=""):
+    """
+    Build the WHERE clause selecting transactions by year and bank.
+
+    Years are expressed as date ranges, so the query can use the date index.
+
+    Args:
+        years (list, optional): Only select these years.
+        banks (list, optional): Only select these banks.
+        alias (str, optional): Alias of the transactions table, e.g. "t".
+
+    Returns:
+        tuple: (SQL condition, or "" to select all transactions, list of parameters).
+    """
+    prefix = f"{alias}." if alias else ""
+    conditions, params = [], []
+    if years:
+        conditions.append(" OR ".join([f"({prefix}date >= ? AND {prefix}date < ?)"] * len(years)))
+        for year in years:
+            params += [f"{int(year):04d}-01-01", f"{int(year) + 1:04d}-01-01"]
+    if banks:
+        conditions.append(f"{prefix}bank_name IN ({', '.join('?' * len(banks))})")
+        params += list(banks)
+    return " AND ".join(f"({condition})" for condition in conditions), params
+
+def rollup_filter(years=None, banks=None):
+    """
+    Build the WHERE clause selecting rollup buckets by year and bank.
+
+    Args:
+        years (list, optional): Only select these years.
+        banks (list, optional): Only select these banks.
+
+    Returns:
+        tuple: (SQL condition, or "" to select all buckets, list of parameters).
+    """
+    conditions, params = [], []
+    if years:
+        conditions.append(f"year IN ({', '.join('?' * len(years))})")
+        params += [int(year) for year in years]
+    if banks:
+        conditions.append(f"bank_name IN ({', '.join('?' * len(banks))})")
+        params += list(banks)
+    return " AND ".join(conditions), params
+
+def _finish_summary(summary, keys):
+    """Sort a summary table by its keys and give every key a stable dtype."""
+    summary = summary.astype({key: "int64" if key in ("year", "month") else object for key in keys})
+    return summary.sort_values(keys, ignore_index=True)[keys + list(SUMMARY_COLUMNS)]
+
+def _pivot(long, column):
+    """Pivot the expenditure per category and `column` into a category x column table."""
+    long = long.astype({column: "int64", "category": object})
+    return long.set_index(["category", column])["cost"].unstack().fillna(0).abs()
+
+def sql_aggregations(db_path, version, years=None, banks=None, table_name=CATEGORY_TABLE):
+    """
+    Compute the report's summary tables with GROUP BY queries over the monthly rollup.
+
+    Args:
+        db_path (str): Path to the SQLite database file.
+        version (str): Rule version the selected transactions must be categorized with.
+        years (list, optional): Only aggregate these years.
+        banks (list, optional): Only aggregate these banks.
+        table_name (str, optional): Name of the category assignments table.
+
+    Returns:
+        dict: Table name -> DataFrame, for the SUMMARY_KEYS and EXPENSE_PIVOTS tables.
+
+    Raises:
+        ValueError: If some selected transactions have no assignment for `version`, or
+            the rollup does not include all transactions.
+    """
+    condition, params = transaction_filter(years, banks, alias="t")
+    conn = connect(db_path, profile="analytics")
+    try:
+        # Only the selected transactions are checked, found through the date and bank indexes
+        missing = conn.execute(
+            f"SELECT COUNT(*) FROM transactions t LEFT JOIN {table_name} c "
+            "ON c.transaction_hash = t.transaction_hash AND c.rule_version = ? "
+            "WHERE c.transaction_hash IS NULL"
+            + (f" AND {condition}" if condition else ""),
+            [version] + params,
+        ).fetchone()[0]
+        if missing:
+            raise ValueError(f"{missing} transactions have no category assignment for rule version {version[:12]}")
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+        watermark = get_watermark(conn)
+        if watermark is None or watermark < last_id:
+            raise ValueError(f"{ROLLUP_TABLE} does not include transactions after id {watermark}")
+
+        condition, params = rollup_filter(years, banks)
+        where = f" WHERE {condition}" if condition else ""
+        dated_where = f" WHERE {' AND '.join(filter(None, [condition, f'year <> {UNDATED}']))}"
+        tables = {}
+        summary_sql = ", ".join(f"{expression} AS {name}" for name, expression in SUMMARY_COLUMNS.items())
+        for name, keys in SUMMARY_KEYS.items():
+            table_where = dated_where if "year" in keys else where
+            query = f"SELECT {', '.join(keys)}, {summary_sql} FROM {ROLLUP_TABLE}{table_where} GROUP BY {', '.join(keys)}"
+            tables[name] = _finish_summary(pd.read_sql_query(query, conn, params=params), keys)
+        for name, column in EXPENSE_PIVOTS.items():
+            query = (
+                f"SELECT category, {column}, {SUMMARY_COLUMNS['Total_Expenditure']} AS cost "
+                f"FROM {ROLLUP_TABLE}{dated_where} GROUP BY category, {column}"
+            )
+            tables[name] = _pivot(pd.read_sql_query(query, conn, params=params), column)
+    finally:
+        conn.close()
+    logging.info(f"Computed {len(tables)} summary tables from {ROLLUP_TABLE}.")
+    return tables
+
+def frame_aggregations(df):
+    """
+    Compute the report's summary tables from a DataFrame of transactions (pandas fallback).
+
+    Args:
+        df (pandas.DataFrame): Transactions with 'date' (datetime64), 'amount' and
+            'category' columns.
+
+    Returns:
+        dict: Table name -> DataFrame, as returned by sql_aggregations.
+    """
+    frame = pd.DataFrame({
+        "year": df["date"].dt.year,
+        "month": df["date"].dt.month,
+        "category": df["category"].astype(object),
+        "Total_Income": df["amount"].where(df["amount"] > 0, 0),
+        "Total_Expenditure": df["amount"].where(df["amount"] < 0, 0),
+        "Net_Balance": df["amount"],
+    })
+    dated = frame.dropna(subset=["year"])
+
+    tables = {}
+    for name, keys in SUMMARY_KEYS.items():
+        summary = (dated if "year" in keys else frame).groupby(keys)[list(SUMMARY_COLUMNS)].sum().reset_index()
+        tables[name] = _finish_summary(summary, keys)
+    for name, column in EXPENSE_PIVOTS.items():
+        long = dated.groupby(["category", column])["Total_Expenditure"].sum().rename("cost").reset_index()
+        tables[name] = _pivot(long, column)
+    return tables
+
+def verify_aggregations(df, db_path, version, years=None, banks=None, tolerance=1e-6):
+    """
+    Check that the SQL and pandas aggregations give the same tables.
+
+    Args:
+        df (pandas.DataFrame): The selected transactions, categorized with `version`.
+        db_path (str): Path to the SQLite database file.
+        version (str): Rule version of the category assignments.
+        years (list, optional): Years selected in `df`.
+        banks (list, optional): Banks selected in `df`.
+        tolerance (float, optional): Largest accepted absolute difference between sums.
+
+    Returns:
+        list: Names of the tables that differ (empty if all match).
+    """
+    expected = frame_aggregations(df)
+    actual = sql_aggregations(db_path, version, years=years, banks=banks)
+    mismatches = []
+    for name in expected:
+        try:
+            pd.testing.assert_frame_equal(
+                actual[name], expected[name], check_exact=False, atol=tolerance, rtol=0,
+                check_names=False, check_column_type=False, check_index_type=False,
+            )
+        except AssertionError as e:
+            logging.error(f"Aggregation '{name}' differs between SQLite and pandas: {e}")
+            mismatches.append(name)
+    return mismatches
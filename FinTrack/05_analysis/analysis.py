@@ -7,7 +7,8 @@ aggregates and visualizes financial data, and generates a detailed PDF report.
 
 Key features:
     - Loads AI-generated categories for transaction classification.
-    - Categorizes transactions using fast, vectorized keyword matching.
+    - Categorizes transactions using a multi-keyword (Aho-Corasick) matcher, storing the
+      assignments so that only new transactions are matched on the next run.
     - Aggregates data by year, month, and category.
     - Exports uncategorized transactions for review.
     - Generates cumulative spending plots and summary tables.
@@ -17,38 +18,99 @@ Intended to be run as a standalone script after the categorization and data clea
 """
 
 import logging
-import sqlite3
 import pandas as pd
-import re
-import matplotlib.pyplot as plt
-import numpy as np
-from fpdf import FPDF
-import seaborn as sns
-import matplotlib.colors as mcolors
 from datetime import datetime
 import os
 import json
 import sys
+import argparse
 
 ANALYSIS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ANALYSIS_DIR, "..", "03_data_cleaning"))
+
+from db_connection import DB_PATH, connect  # noqa: E402
+from staging import STAGING_DIR, load_staging  # noqa: E402
+from category_store import categorize_transactions, rule_version  # noqa: E402
+from aggregations import frame_aggregations, sql_aggregations, transaction_filter, verify_aggregations  # noqa: E402
+from plots import cumulative_area_job, keyword_area_job, render_jobs  # noqa: E402
+
 BUILD_DIR = os.path.join(ANALYSIS_DIR, "_build")
-os.makedirs(BUILD_DIR, exist_ok=True)
 
 AI_CATS_PATH = os.path.join(ANALYSIS_DIR, "..", "07_AI_categorisation", "outputs", "AI_Categorisation_cleaned.json")
-if os.path.exists(AI_CATS_PATH):
-    with open(AI_CATS_PATH, "r", encoding="utf-8") as f:
+
+def load_categories(path=AI_CATS_PATH):
+    """
+    Load the AI-generated categories and their keywords.
+
+    Args:
+        path (str, optional): Path to the cleaned AI categorisation JSON file.
+
+    Returns:
+        dict: Mapping of category names to lists of keywords (empty if the file does not exist).
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
         ai_categories = json.load(f)
     ai_categories = [entry for entry in ai_categories if entry.get("Category") and entry.get("Keywords")]
-    categories = {entry["Category"]: entry["Keywords"] for entry in ai_categories}
-else:
-    categories = {}
+    return {entry["Category"]: entry["Keywords"] for entry in ai_categories}
+
+# Transaction columns used by the report
+REPORT_COLUMNS = ["transaction_hash", "date", "sender_receiver", "booking_text", "purpose", "amount", "bank_name"]
+
+# Low-cardinality text columns held as categoricals
+CATEGORICAL_COLUMNS = ["bank_name", "currency", "booking_text"]
+
+def load_transactions(columns=REPORT_COLUMNS, source="db", years=None, banks=None):
+    """
+    Load transactions from the database or from the Parquet staging dataset.
+
+    The staging dataset (written by `db_update.py --staging`) is typed and partitioned
+    by year and bank, so only the requested columns and partitions are read.
+
+    Args:
+        columns (list, optional): Columns to load.
+        source (str, optional): "db" for the SQLite database, "staging" for the staging dataset.
+        years (list, optional): Only load these years.
+        banks (list, optional): Only load these banks.
 
-def main():
+    Returns:
+        pandas.DataFrame: The transactions, with `date` as datetime64, amounts as float64
+        and the CATEGORICAL_COLUMNS as categoricals.
+    """
+    if source == "staging":
+        df = load_staging(columns=columns, years=years, banks=banks, staging_dir=STAGING_DIR)
+        return df.astype({col: "category" for col in CATEGORICAL_COLUMNS if col in df.columns})
+
+    condition, params = transaction_filter(years, banks)
+    query = f"SELECT {', '.join(columns)} FROM transactions"
+    if condition:
+        query += f" WHERE {condition}"
+
+    conn = connect(DB_PATH, profile="analytics")
+    try:
+        logging.info(f"Connected to database: {DB_PATH}")
+        df = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+        logging.info("Database connection closed.")
+    # Dates are stored as ISO-8601 text (typed schema)
+    if "date" in df.columns:
+        df['date'] = pd.to_datetime(df['date'], format='ISO8601', errors='coerce')
+    return df.astype({col: "category" for col in CATEGORICAL_COLUMNS if col in df.columns})
+
+def main(source="db", years=None, banks=None, workers=None):
     """
     Run the financial analysis pipeline and generate a PDF report.
 
     Loads AI-generated categories, processes transaction data, performs categorization,
     creates summary tables and plots, and exports a comprehensive PDF report.
+
+    Args:
+        source (str, optional): Where to load transactions from ("db" or "staging").
+        years (list, optional): Only report on these years.
+        banks (list, optional): Only report on these banks.
+        workers (int, optional): Processes rendering the plots (default: number of CPUs).
     """
 
     # --- Logging configuration ---
@@ -59,72 +121,36 @@ def main():
     )
     logging.info("Starting Analysis.py")
 
-    # Use the same absolute path in both scripts
-    DB_PATH = r"C:\public_projects\portfolio\FinTrack\03_data_cleaning\bank_statements.db"
-    conn = sqlite3.connect(DB_PATH)
+    # The PDF library is only needed to build the report (plots are rendered by plots.py)
+    from fpdf import FPDF
 
-    # -------- Load data from the new database --------
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    categories = load_categories()
+
+    # -------- Load transactions --------
     try:
-        conn = sqlite3.connect(DB_PATH)
-        logging.info(f"Connected to database: {DB_PATH}")
-        query = """
-        SELECT 
-            date, 
-            sender_receiver,
-            booking_text, 
-            purpose, 
-            amount, 
-            bank_name
-        FROM transactions
-        """
-        df = pd.read_sql_query(query, conn)
-        logging.info(f"Loaded {len(df)} transactions from database.")
+        df = load_transactions(source=source, years=years, banks=banks)
+        logging.info(f"Loaded {len(df)} transactions from {source}.")
     except Exception as e:
-        logging.error(f"Error loading data from database: {e}")
+        logging.error(f"Error loading transactions from {source}: {e}")
         raise
-    finally:
-        conn.close()
-        logging.info("Database connection closed.")
 
-    # Convert date and amount columns
-    df['date'] = pd.to_datetime(df['date'], format='%d.%m.%Y', errors='coerce')
-    df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-    df['cost'] = df['amount'].apply(lambda x: x if x < 0 else 0)
-    df['income'] = df['amount'].apply(lambda x: x if x > 0 else 0)
-    logging.info("Converted date and amount columns.")
+    # Amounts are stored as REAL (typed schema)
+    df['cost'] = df['amount'].where(df['amount'] < 0, 0)
+    df['income'] = df['amount'].where(df['amount'] > 0, 0)
+    logging.info("Converted date column.")
 
     # Add year, month, day columns
     df['year'] = df['date'].dt.year
     df['month'] = df['date'].dt.month
     df['day'] = df['date'].dt.day
     
-    # --- Fast categorization using vectorized string matching ---
-    def fast_categorize(df, categories):
-        """
-        Categorize transactions using vectorized keyword matching.
-
-        Args:
-            df (pandas.DataFrame): DataFrame containing transaction data.
-            categories (dict): Mapping of category names to lists of keywords.
-
-        Returns:
-            pandas.Series: Series of assigned categories for each transaction.
-        """
-        text_col = (
-            df['sender_receiver'].fillna('') + ' ' +
-            df['booking_text'].fillna('') + ' ' +
-            df['purpose'].fillna('')
-        ).str.lower()
-        result = pd.Series('Other', index=df.index)
-        for cat, keywords in categories.items():
-            for kw_obj in keywords:
-                kw = kw_obj['keyword'] if isinstance(kw_obj, dict) and 'keyword' in kw_obj else str(kw_obj)
-                mask = text_col.str.contains(re.escape(kw.lower()), regex=True)
-                result[mask] = cat
-        return result
-
-    df['category'] = fast_categorize(df, categories)
-    logging.info("Categorization completed using fast vectorized method.")
+    # --- Categorization: stored assignments, keyword automaton for new or stale rows ---
+    # The matched keyword is kept for the per-keyword plots and tables
+    assignments = categorize_transactions(df, categories, DB_PATH)
+    df['category'] = assignments['category']
+    df['keyword'] = assignments['keyword'].fillna('Other')
+    logging.info("Categorization completed.")
 
 # -------- Export uncategorized transactions for review --------
     # Ensure the outputs directory exists
@@ -134,18 +160,24 @@ def main():
     other_df = df[df['category'] == 'Other']
     if not other_df.empty:
         uncategorized_path = os.path.join(ANALYSIS_DIR, "..", "07_AI_categorisation", "outputs", "uncategorized_transactions.json")
-        other_df.to_json(uncategorized_path, orient="records", force_ascii=False)
+        other_df.drop(columns=['transaction_hash', 'keyword']).to_json(uncategorized_path, orient="records", force_ascii=False)
         logging.info(f"Exported {len(other_df)} uncategorized transactions for review.")
     else:
         logging.info("No uncategorized transactions found.")
 
     # -------- Aggregations --------
+    # Computed inside SQLite when reading from the database, from the DataFrame otherwise
+    aggregates = None
+    if source == "db":
+        try:
+            aggregates = sql_aggregations(DB_PATH, rule_version(categories), years=years, banks=banks)
+        except Exception as e:
+            logging.warning(f"Falling back to pandas aggregations: {e}")
+    if aggregates is None:
+        aggregates = frame_aggregations(df)
+
     # Yearly summary
-    yearly_result = df.groupby('year').agg(
-        Total_Income=('income', 'sum'),
-        Total_Expenditure=('cost', 'sum'),
-        Net_Balance=('amount', 'sum')
-    ).reset_index().round(2)
+    yearly_result = aggregates['yearly'].round(2)
 
     # Add a total row
     total_row = pd.DataFrame({
@@ -157,11 +189,7 @@ def main():
     yearly_result = pd.concat([yearly_result, total_row], ignore_index=True)
 
     # Monthly summary
-    result = df.groupby(['year', 'month']).agg(
-        Total_Income=('income', 'sum'),
-        Total_Expenditure=('cost', 'sum'),
-        Net_Balance=('amount', 'sum')
-    ).reset_index().round(2)
+    result = aggregates['monthly'].round(2)
 
     # Add a total row
     total_row = pd.DataFrame({
@@ -174,108 +202,37 @@ def main():
     result = pd.concat([result, total_row], ignore_index=True)
 
     # Category summary
-    category_sums = df.groupby('category').agg(
-        Total_Income=('income', 'sum'),
-        Total_Expenditure=('cost', 'sum'),
-        Net_Balance=('amount', 'sum')
-    ).reset_index().round(2)
+    category_sums = aggregates['category'].round(2)
 
     # -------- Unique sender_receiver and purpose pairs for 'Other' --------
     unique_other = df[df['category'] == 'Other'][['sender_receiver', 'purpose']].drop_duplicates()
 
     # -------- Yearly and Monthly Delta Tables --------
-    yearly_expenses = df.groupby(['category', 'year'])['cost'].sum().unstack().fillna(0).abs()
+    yearly_expenses = aggregates['yearly_expenses']
     yearly_delta = yearly_expenses.diff(axis=1) / yearly_expenses.shift(axis=1) * 100
     yearly_delta = yearly_delta.fillna(0).map(lambda x: f"{x:.1f}")
 
-    monthly_expenses = df.groupby(['category', 'month'])['cost'].sum().unstack().fillna(0).abs()
+    monthly_expenses = aggregates['monthly_expenses']
     monthly_delta = monthly_expenses.diff(axis=1) / monthly_expenses.shift(axis=1) * 100
     monthly_delta = monthly_delta.fillna(0).map(lambda x: f"{x:.1f}")
 
     # -------- Plots --------
-    def plot_cumulative_area():
-        """
-        Generate and save a stacked area plot of cumulative spending by category.
-
-        Saves the plot as 'cumulative_spending_plot.png' in the build directory.
-        """
-        try:
-            df_filtered = df[df['cost'] != 0].copy()
-            df_filtered['year'] = df_filtered['date'].dt.year
-            df_filtered['month'] = df_filtered['date'].dt.month
-            df_grouped = df_filtered.groupby(['year', 'month', 'category'])['cost'].sum().reset_index()
-            df_grouped = df_grouped.sort_values(by=['year', 'month', 'category'])
-            df_pivot = df_grouped.pivot_table(index=['year', 'month'], columns='category', values='cost', aggfunc='sum').fillna(0)
-            df_cumulative = df_pivot.cumsum(axis=0)
-            categories_list = df_cumulative.columns
-            color_palette = list(mcolors.TABLEAU_COLORS.values()) * (len(categories_list) // 10 + 1)
-            color_palette = color_palette[:len(categories_list)]
-            fig, ax = plt.subplots(figsize=(8,6), dpi=150, constrained_layout=True)
-            df_cumulative.plot.area(stacked=True, color=color_palette, ax=ax)
-            plt.xlabel('Year-Month')
-            plt.ylabel('Cumulative Spending (€)')
-            plt.title('Stacked Cumulative Spending by Category')
-            plt.legend(title='Categories', loc='upper left')
-            plt.grid(True)
-            plt.savefig(os.path.join(BUILD_DIR, "cumulative_spending_plot.png"), dpi=150, pad_inches=0.1)
-            plt.close()
-            logging.info("Cumulative area plot generated.")
-        except Exception as e:
-            logging.error(f"Error generating cumulative area plot: {e}")
-
-    plot_cumulative_area()
-
-    def plot_cumulative_area_by_keyword(category):
-        """
-        Generate and save a cumulative spending area plot by keyword for a given category.
-
-        Args:
-            category (str): The category for which to generate the plot.
-
-        Saves the plot as 'cumulative_spending_plot_{category}.png' in the build directory.
-        """
+    # Plot jobs hold the aggregated data; they are rendered in parallel processes and
+    # all images are written before the PDF is assembled
+    plot_jobs = []
+    try:
+        plot_jobs.append(cumulative_area_job(df, os.path.join(BUILD_DIR, "cumulative_spending_plot.png")))
+    except Exception as e:
+        logging.error(f"Error generating cumulative area plot: {e}")
+    for category in categories:
         try:
-            plt.close('all')
-            keywords = categories.get(category, [])
-            df_category = df[df['category'] == category].copy()
-            def find_keyword(row):
-                text = normalize_text(f"{row['sender_receiver']} {row['booking_text']} {row['purpose']}")
-                for kw_obj in keywords:
-                    kw = kw_obj['keyword'] if isinstance(kw_obj, dict) and 'keyword' in kw_obj else str(kw_obj)
-                    kw_norm = normalize_text(kw)
-                    if kw_norm in text:
-                        return kw
-                return 'Other'
-            df_category['Keyword'] = df_category.apply(find_keyword, axis=1)
-            # Only keep expense rows
-            df_category = df_category[df_category['cost'] != 0]
-            if df_category.empty:
-                return  # Nothing to plot
-            df_grouped = df_category.groupby(['date', 'Keyword'])['cost'].sum().reset_index()
-            df_pivot = df_grouped.pivot(index='date', columns='Keyword', values='cost').fillna(0)
-            # Drop columns that are all zeros (no data)
-            df_pivot = df_pivot.loc[:, (df_pivot != 0).any(axis=0)]
-            if df_pivot.empty:
-                return  # Nothing to plot
-            df_cumulative = df_pivot.cumsum()
-            fig, ax = plt.subplots(figsize=(12, 6))
-            df_cumulative.plot.area(alpha=0.6, colormap='tab10', ax=ax)
-            plt.xlabel("Date")
-            plt.ylabel("Cumulative Spending (€)")
-            plt.title(f"Cumulative Spending by Keyword in {category}")
-            plt.legend(title="Keyword", bbox_to_anchor=(1.05, 1), loc='upper left')
-            plt.grid()
-            plt.tight_layout()
-            # For category plots:
-            filename = os.path.join(BUILD_DIR, f"cumulative_spending_plot_{category}.png")
-            fig.savefig(filename, dpi=150, bbox_inches="tight", pad_inches=0.1)
-            plt.close(fig)
-            logging.info(f"Cumulative area plot by keyword generated for category: {category}")
+            job = keyword_area_job(df, category, os.path.join(BUILD_DIR, f"cumulative_spending_plot_{category}.png"))
         except Exception as e:
             logging.error(f"Error generating cumulative area plot for category {category}: {e}")
-
-    for category in categories:
-        plot_cumulative_area_by_keyword(category)
+            continue
+        if job is not None:
+            plot_jobs.append(job)
+    render_jobs(plot_jobs, workers=workers)
 
     # -------- PDF Report --------
 
@@ -447,18 +404,9 @@ def main():
     pdf.ln(5)
 
     for cat in sorted(df_1999['category'].unique()):
-        cat_df = df_1999[df_1999['category'] == cat].copy()
+        cat_df = df_1999[df_1999['category'] == cat].rename(columns={'keyword': 'Keyword'})
         if cat_df.empty:
             continue
-        keywords = categories.get(cat, [])
-        def find_keyword(row):
-            text = f"{row['sender_receiver']} {row['booking_text']} {row['purpose']}".lower()
-            for kw_obj in keywords:
-                kw = kw_obj['keyword'] if isinstance(kw_obj, dict) and 'keyword' in kw_obj else str(kw_obj)
-                if kw.lower() in text.lower():
-                    return kw
-            return 'Other'
-        cat_df['Keyword'] = cat_df.apply(find_keyword, axis=1)
         detail = cat_df.groupby(['Keyword', 'month'])['amount'].sum().unstack(fill_value=0).round(2)
         detail['Total'] = detail.sum(axis=1)
         detail.loc['Total'] = detail.sum(axis=0)
@@ -495,19 +443,47 @@ def main():
     print(f"PDF report generated successfully: {output_filename}")
     logging.info("Analysis completed successfully.")
 
-def normalize_text(text):
+def check_aggregations(years=None, banks=None):
     """
-    Normalize text by lowercasing and removing non-alphanumeric characters except spaces.
+    Compare the summary tables computed in SQLite with those computed in pandas.
+
+    Transactions are categorized first, so that their assignments are stored.
 
     Args:
-        text (str): Input string.
+        years (list, optional): Only compare these years.
+        banks (list, optional): Only compare these banks.
 
     Returns:
-        str: Normalized string.
+        bool: True if all tables match.
     """
-
-    # Lowercase and remove all non-alphanumeric characters except spaces
-    return re.sub(r'[^a-z0-9 ]', '', text.lower())
+    categories = load_categories()
+    df = load_transactions(years=years, banks=banks)
+    df['category'] = categorize_transactions(df, categories, DB_PATH)['category']
+    mismatches = verify_aggregations(df, DB_PATH, rule_version(categories), years=years, banks=banks)
+    for name in mismatches:
+        print(f"MISMATCH: {name}")
+    print(f"Compared SQLite and pandas aggregations over {len(df)} transactions: "
+          + ("all tables match." if not mismatches else f"{len(mismatches)} tables differ."))
+    return not mismatches
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate the FinTrack analysis report.")
+    parser.add_argument(
+        "--source", choices=["db", "staging"], default="db",
+        help="Load transactions from the SQLite database or the Parquet staging dataset (default: db)."
+    )
+    parser.add_argument("--years", type=int, nargs="+", help="Only report on these years.")
+    parser.add_argument("--banks", nargs="+", help="Only report on these banks.")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Number of processes rendering the plots (default: number of CPUs; 1 renders in this process)."
+    )
+    parser.add_argument(
+        "--verify-aggregations", action="store_true",
+        help="Check that the SQLite and pandas aggregations give the same tables, then exit."
+    )
+    args = parser.parse_args()
+    if args.verify_aggregations:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+        sys.exit(0 if check_aggregations(years=args.years, banks=args.banks) else 1)
+    main(source=args.source, years=args.years, banks=args.banks, workers=args.workers)
\ No newline at end of file
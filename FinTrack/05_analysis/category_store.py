@@ -0,0 +1,163 @@
+"""
+category_store.py
+
+Persisted category assignments of transactions.
+
+The category and matched keyword of each transaction are stored in the
+`transaction_categories` table of the SQLite database, keyed by transaction_hash and
+stamped with the version of the categorization rules they were computed with. The rule
+version is a hash of the rules loaded from AI_Categorisation_cleaned.json and of the
+keyword precedence.
+
+On each run, only transactions without an assignment for the current rule version
+(new transactions, or all of them after the rules changed) are matched again, so the
+cost of categorization follows the number of new rows instead of the size of the history.
+Changed assignments are applied to the monthly rollup (see 03_data_cleaning/rollup.py)
+in the same transaction.
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+import pandas as pd
+
+from db_connection import connect
+from keyword_matcher import KeywordMatcher
+from rollup import CATEGORY_TABLE, apply_category_changes, create_category_table, update_rollup
+
+# Category of transactions that match no keyword
+DEFAULT_CATEGORY = "Other"
+
+def rule_version(categories, precedence="last"):
+    """
+    Return the version of a set of categorization rules.
+
+    Args:
+        categories (dict): Mapping of category names to lists of keywords.
+        precedence (str, optional): Keyword precedence of the matcher.
+
+    Returns:
+        str: SHA-256 hex digest of the rules, in order, and of the precedence.
+    """
+    rules = json.dumps({"precedence": precedence, "categories": categories}, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(rules.encode("utf-8")).hexdigest()
+
+def load_assignments(conn, version, table_name=CATEGORY_TABLE):
+    """
+    Load the stored assignments computed with a rule version.
+
+    Args:
+        conn (sqlite3.Connection): Open connection to the database.
+        version (str): Rule version.
+        table_name (str, optional): Name of the table.
+
+    Returns:
+        pandas.DataFrame: 'category' and 'keyword' columns, indexed by transaction_hash.
+    """
+    return pd.read_sql_query(
+        f"SELECT transaction_hash, category, keyword FROM {table_name} WHERE rule_version = ?",
+        conn, params=(version,), index_col="transaction_hash",
+    )
+
+def save_assignments(conn, assignments, version, table_name=CATEGORY_TABLE):
+    """
+    Insert or replace the assignments of transactions.
+
+    Args:
+        conn (sqlite3.Connection): Open connection to the database.
+        assignments (pandas.DataFrame): 'transaction_hash', 'category' and 'keyword' columns.
+        version (str): Rule version the assignments were computed with.
+        table_name (str, optional): Name of the table.
+
+    Returns:
+        None
+    """
+    rows = zip(
+        assignments["transaction_hash"],
+        assignments["category"],
+        assignments["keyword"].astype(object).where(assignments["keyword"].notna(), None),
+        [version] * len(assignments),
+    )
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {table_name} (transaction_hash, category, keyword, rule_version) "
+        "VALUES (?, ?, ?, ?)",
+        rows,
+    )
+
+def transaction_texts(df):
+    """Return the text matched against the keywords: sender_receiver, booking_text and purpose."""
+    # Categorical columns are concatenated as plain strings
+    return (
+        df['sender_receiver'].astype(object).fillna('') + ' ' +
+        df['booking_text'].astype(object).fillna('') + ' ' +
+        df['purpose'].astype(object).fillna('')
+    )
+
+def _match(df, matcher):
+    """Match transactions with a KeywordMatcher, with keyword None for uncategorized transactions."""
+    matched = matcher.match_series(transaction_texts(df), default=DEFAULT_CATEGORY).astype(object)
+    matched["keyword"] = matched["keyword"].where(matched["keyword"].notna(), None)
+    return matched
+
+def categorize_transactions(df, categories, db_path, precedence="last", table_name=CATEGORY_TABLE):
+    """
+    Return the category and matched keyword of transactions, reusing stored assignments.
+
+    Transactions without an assignment for the current rule version are matched with
+    a KeywordMatcher and their assignments are stored. If the database does not exist
+    or cannot be written to, the assignments are computed without being stored.
+
+    Args:
+        df (pandas.DataFrame): Transactions with 'transaction_hash', 'sender_receiver',
+            'booking_text' and 'purpose' columns.
+        categories (dict): Mapping of category names to lists of keywords.
+        db_path (str): Path to the SQLite database file.
+        precedence (str, optional): Keyword precedence, see keyword_matcher.
+        table_name (str, optional): Name of the assignments table.
+
+    Returns:
+        pandas.DataFrame: 'category' and 'keyword' columns (keyword is None for
+        uncategorized transactions), indexed like `df`.
+    """
+    version = rule_version(categories, precedence)
+    matcher = KeywordMatcher(categories, precedence=precedence)
+
+    if not os.path.exists(db_path):
+        logging.warning(f"Database {db_path} not found; category assignments are not stored.")
+        return _match(df, matcher)
+
+    conn = connect(db_path)
+    try:
+        create_category_table(conn, table_name)
+        stored = load_assignments(conn, version, table_name)
+        result = pd.DataFrame(
+            {
+                "category": df["transaction_hash"].map(stored["category"]).astype(object),
+                "keyword": df["transaction_hash"].map(stored["keyword"]).astype(object),
+            },
+            index=df.index,
+        )
+        pending = result["category"].isna()
+        # Also rebuilds a rollup written by an older version of rollup.py
+        update_rollup(conn)
+        if pending.any():
+            matched = _match(df[pending], matcher)
+            result.loc[pending, ["category", "keyword"]] = matched
+            matched["transaction_hash"] = df.loc[pending, "transaction_hash"]
+            apply_category_changes(conn, matched)
+            save_assignments(conn, matched, version, table_name)
+        conn.commit()
+        result["keyword"] = result["keyword"].where(result["keyword"].notna(), None)
+        logging.info(
+            f"Categorized {int(pending.sum())} new or stale transactions, "
+            f"reused {int((~pending).sum())} stored assignments (rule version {version[:12]})."
+        )
+    except Exception as e:
+        conn.rollback()
+        logging.warning(f"Could not use stored category assignments in {db_path}: {e}")
+        result = _match(df, matcher)
+    finally:
+        conn.close()
+    return result
@@ -0,0 +1,193 @@
+"""
+keyword_matcher.py
+
+Multi-keyword matcher for categorizing transactions, based on an Aho-Corasick automaton.
+
+All keywords of all categories are compiled into one automaton, so each transaction
+text is scanned once, whatever the number of keywords, instead of once per keyword.
+Identical texts (e.g. recurring payments) are matched only once.
+
+The C implementation of the optional `pyahocorasick` package is used when it is
+installed; otherwise a pure-Python automaton is used, with the same results.
+
+Precedence:
+    When several keywords occur in a text, the keyword order decides. Keywords are
+    ordered as in the categories mapping: category by category, and within a category
+    in list order.
+
+    - "last" (default): the last matching keyword wins. This is the behaviour of
+      applying one `str.contains` mask per keyword in order, each overwriting the
+      previous ones, as `fast_categorize` in analysis.py used to do.
+    - "first": the first matching keyword wins.
+"""
+
+import pandas as pd
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+PRECEDENCES = ("last", "first")
+
+def keyword_text(kw_obj):
+    """Return the keyword string of a keyword entry (a dict with a 'keyword' key or a string)."""
+    return kw_obj['keyword'] if isinstance(kw_obj, dict) and 'keyword' in kw_obj else str(kw_obj)
+
+class KeywordMatcher:
+    """
+    Find the category and keyword of a text according to categorization rules.
+
+    Args:
+        categories (dict): Mapping of category names to lists of keywords (strings or
+            dicts with a 'keyword' key). Matching is case-insensitive substring matching.
+        precedence (str, optional): "last" or "first", see the module documentation.
+        use_pyahocorasick (bool, optional): Use the pyahocorasick package (default: if installed).
+
+    Raises:
+        ValueError: If the precedence is unknown, or pyahocorasick is requested but not installed.
+    """
+
+    def __init__(self, categories, precedence="last", use_pyahocorasick=None):
+        if precedence not in PRECEDENCES:
+            raise ValueError(f"Unknown precedence: {precedence} (expected one of {PRECEDENCES})")
+        if use_pyahocorasick is None:
+            use_pyahocorasick = ahocorasick is not None
+        elif use_pyahocorasick and ahocorasick is None:
+            raise ValueError("pyahocorasick is not installed")
+
+        # rules[rank] = (category, keyword); a higher rank takes precedence
+        entries = [(category, keyword_text(kw_obj)) for category, keywords in categories.items() for kw_obj in keywords]
+        if precedence == "first":
+            entries.reverse()
+        self.rules = entries
+
+        # Best rank per distinct lowercased keyword
+        ranks = {}
+        for rank, (_, keyword) in enumerate(entries):
+            ranks[keyword.lower()] = rank
+        # The empty keyword occurs in every text
+        self._empty_rank = ranks.pop("", -1)
+
+        if use_pyahocorasick:
+            self._automaton = ahocorasick.Automaton()
+            for pattern, rank in ranks.items():
+                self._automaton.add_word(pattern, rank)
+            if ranks:
+                self._automaton.make_automaton()
+            self._best_rank = self._best_rank_pyahocorasick if ranks else self._best_rank_empty
+        else:
+            self._build(ranks)
+            self._best_rank = self._best_rank_python
+
+    def _build(self, ranks):
+        """Build the pure-Python automaton: trie transitions, failure links and best rank per state."""
+        goto = [{}]
+        best = [self._empty_rank]
+        for pattern, rank in ranks.items():
+            node = 0
+            for ch in pattern:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    best.append(-1)
+                node = nxt
+            best[node] = max(best[node], rank)
+
+        # Breadth-first: a state's failure link points to a shallower state, whose best
+        # rank (including the ranks along its own failure chain) is already final
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for node in queue:
+            best[node] = max(best[node], best[0])
+        for node in queue:
+            for ch, nxt in goto[node].items():
+                state = fail[node]
+                while ch not in goto[state] and state:
+                    state = fail[state]
+                fail[nxt] = goto[state].get(ch, 0)
+                best[nxt] = max(best[nxt], best[fail[nxt]])
+                queue.append(nxt)
+        self._goto, self._fail, self._best = goto, fail, best
+
+    def _best_rank_python(self, text):
+        goto, fail, best_of = self._goto, self._fail, self._best
+        node = 0
+        best = self._empty_rank
+        for ch in text:
+            while True:
+                nxt = goto[node].get(ch)
+                if nxt is not None:
+                    node = nxt
+                    break
+                if not node:
+                    break
+                node = fail[node]
+            if best_of[node] > best:
+                best = best_of[node]
+        return best
+
+    def _best_rank_pyahocorasick(self, text):
+        best = self._empty_rank
+        for _, rank in self._automaton.iter(text):
+            if rank > best:
+                best = rank
+        return best
+
+    def _best_rank_empty(self, text):
+        return self._empty_rank
+
+    def match(self, text):
+        """
+        Return the rule matching a text.
+
+        Args:
+            text (str): Transaction text.
+
+        Returns:
+            tuple: (category, keyword) of the winning keyword, or None if no keyword occurs.
+        """
+        rank = self._best_rank(text.lower())
+        return self.rules[rank] if rank >= 0 else None
+
+    def match_series(self, texts, default="Other"):
+        """
+        Match a Series of texts, scanning each distinct text once.
+
+        Args:
+            texts (pandas.Series): Transaction texts.
+            default (str, optional): Category of texts without a match.
+
+        Returns:
+            pandas.DataFrame: 'category' and 'keyword' columns, indexed like `texts`
+            (keyword is None for texts without a match).
+        """
+        codes, uniques = pd.factorize(texts.fillna("").str.lower())
+        categories, keywords = [], []
+        for text in uniques:
+            rank = self._best_rank(text)
+            category, keyword = self.rules[rank] if rank >= 0 else (default, None)
+            categories.append(category)
+            keywords.append(keyword)
+        return pd.DataFrame(
+            {
+                "category": pd.Series(categories, dtype=object).take(codes).to_numpy(),
+                "keyword": pd.Series(keywords, dtype=object).take(codes).to_numpy(),
+            },
+            index=texts.index,
+        )
+
+    def categorize(self, texts, default="Other"):
+        """
+        Return the category of each text of a Series.
+
+        Args:
+            texts (pandas.Series): Transaction texts.
+            default (str, optional): Category of texts without a match.
+
+        Returns:
+            pandas.Series: The categories, indexed like `texts`.
+        """
+        return self.match_series(texts, default=default)["category"]
@@ -0,0 +1,151 @@
+"""
+plots.py
+
+Rendering of the report's plots in parallel processes.
+
+A plot job is plain data: the name of its renderer, the aggregated frame to draw, the
+output path and the style options. Jobs are built in the main process, where the
+transactions are, and rendered by a pool of processes with matplotlib's non-interactive
+Agg backend, so only the small aggregated frames are sent to the workers and the
+rendering time is spread over the available cores.
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+def cumulative_area_job(df, path):
+    """
+    Build the job of the stacked area plot of cumulative spending by category.
+
+    Args:
+        df (pandas.DataFrame): Categorized transactions with 'year', 'month', 'category'
+            and 'cost' columns.
+        path (str): Output PNG path.
+
+    Returns:
+        dict: The plot job.
+    """
+    df_filtered = df.loc[df['cost'] != 0, ['year', 'month', 'category', 'cost']]
+    df_grouped = df_filtered.groupby(['year', 'month', 'category'])['cost'].sum().reset_index()
+    df_grouped = df_grouped.sort_values(by=['year', 'month', 'category'])
+    df_pivot = df_grouped.pivot_table(index=['year', 'month'], columns='category', values='cost', aggfunc='sum').fillna(0)
+    return {"renderer": "cumulative_area", "data": df_pivot.cumsum(axis=0), "path": path}
+
+def keyword_area_job(df, category, path):
+    """
+    Build the job of the cumulative spending area plot by keyword for a category.
+
+    Args:
+        df (pandas.DataFrame): Categorized transactions with 'date', 'category', 'keyword'
+            and 'cost' columns.
+        category (str): The category to plot.
+        path (str): Output PNG path.
+
+    Returns:
+        dict: The plot job, or None if the category has no expenses to plot.
+    """
+    # Only keep expense rows
+    df_category = df[(df['category'] == category) & (df['cost'] != 0)]
+    if df_category.empty:
+        return None
+    df_grouped = df_category.groupby(['date', 'keyword'])['cost'].sum().reset_index()
+    df_pivot = df_grouped.pivot(index='date', columns='keyword', values='cost').fillna(0)
+    # Drop columns that are all zeros (no data)
+    df_pivot = df_pivot.loc[:, (df_pivot != 0).any(axis=0)]
+    if df_pivot.empty:
+        return None
+    return {
+        "renderer": "keyword_area",
+        "data": df_pivot.cumsum(),
+        "path": path,
+        "title": f"Cumulative Spending by Keyword in {category}",
+    }
+
+def render_cumulative_area(data, path):
+    """Render a stacked cumulative area plot of spending by category."""
+    import matplotlib.pyplot as plt
+    import matplotlib.colors as mcolors
+
+    color_palette = list(mcolors.TABLEAU_COLORS.values()) * (len(data.columns) // 10 + 1)
+    color_palette = color_palette[:len(data.columns)]
+    fig, ax = plt.subplots(figsize=(8,6), dpi=150, constrained_layout=True)
+    data.plot.area(stacked=True, color=color_palette, ax=ax)
+    plt.xlabel('Year-Month')
+    plt.ylabel('Cumulative Spending (€)')
+    plt.title('Stacked Cumulative Spending by Category')
+    plt.legend(title='Categories', loc='upper left')
+    plt.grid(True)
+    plt.savefig(path, dpi=150, pad_inches=0.1)
+    plt.close(fig)
+
+def render_keyword_area(data, path, title):
+    """Render a cumulative area plot of spending by keyword."""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    data.plot.area(alpha=0.6, colormap='tab10', ax=ax)
+    plt.xlabel("Date")
+    plt.ylabel("Cumulative Spending (€)")
+    plt.title(title)
+    plt.legend(title="Keyword", bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.grid()
+    plt.tight_layout()
+    fig.savefig(path, dpi=150, bbox_inches="tight", pad_inches=0.1)
+    plt.close(fig)
+
+# Renderer name -> function called with the other fields of the job
+RENDERERS = {
+    "cumulative_area": render_cumulative_area,
+    "keyword_area": render_keyword_area,
+}
+
+def render_job(job):
+    """
+    Render a plot job with the Agg backend.
+
+    Args:
+        job (dict): The plot job.
+
+    Returns:
+        str: Path of the written image.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    options = {key: value for key, value in job.items() if key != "renderer"}
+    RENDERERS[job["renderer"]](**options)
+    return job["path"]
+
+def render_jobs(jobs, workers=None):
+    """
+    Render plot jobs and wait until all are written.
+
+    With more than one worker, jobs are rendered in a process pool. A failing job is
+    logged and does not stop the others.
+
+    Args:
+        jobs (list): Plot jobs.
+        workers (int, optional): Number of processes (default: number of CPUs);
+            1 renders in the current process.
+
+    Returns:
+        list: Paths of the written images.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    rendered = []
+    if workers <= 1:
+        for job in jobs:
+            try:
+                rendered.append(render_job(job))
+            except Exception as e:
+                logging.error(f"Error rendering plot {job['path']}: {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(render_job, job): job for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    rendered.append(future.result())
+                except Exception as e:
+                    logging.error(f"Error rendering plot {futures[future]['path']}: {e}")
+    logging.info(f"Rendered {len(rendered)} of {len(jobs)} plots with {max(workers, 1)} worker(s).")
+    return rendered
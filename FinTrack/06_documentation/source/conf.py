@@ -5,6 +5,8 @@
 import os
 import sys
 sys.path.insert(0, os.path.abspath('../..'))  # Adjust this path as needed
+sys.path.insert(0, os.path.abspath('../../03_data_cleaning'))  # Sibling imports of the scripts
+sys.path.insert(0, os.path.abspath('../../05_analysis'))
 
 # -- Project information -----------------------------------------------------
 # https://www.sphinx-doc.org/en/master/usage/configuration.html#project-information
@@ -37,7 +37,6 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SCRIPTS_DIR = os.path.join(BASE_DIR, "scripts")
 OUTPUTS_DIR = os.path.join(BASE_DIR, "outputs")
 INPUTS_DIR = os.path.join(BASE_DIR, "inputs")
-os.makedirs(OUTPUTS_DIR, exist_ok=True)
 MAX_ITERATIONS = 5
 TARGET_COVERAGE = 1.0  # 100%
 
@@ -191,6 +190,7 @@ def main():
     manages uncategorized transactions, and merges results into consolidated output files.
     """
 
+    os.makedirs(OUTPUTS_DIR, exist_ok=True)
     iteration = 1
     previous_count = None
     gen_cat_input = os.path.join(INPUTS_DIR, "transactions.json")  # Start with all transactions
@@ -9,9 +9,8 @@ Typical usage:
 """
 
 import os
-import sys
 import json
-from google import genai
+import argparse
 from pydantic import BaseModel
 import time
 
@@ -57,13 +56,20 @@ def is_valid_json(text):
     except Exception:
         return False
 
-def main():
+def main(input_file=None, output_file=None):
     """
     Main function to categorize transactions using AI.
     Reads the prompt and transaction data, sends it to the AI model, and saves the response.
+
+    Args:
+        input_file (str, optional): Transactions JSON file (default: inputs/transactions.json).
+        output_file (str, optional): Output JSON file (default: outputs/AI_Categorisation.json).
     """
     start_time = time.time()  # Start timing the script execution
 
+    # The GenAI SDK is slow to import, so it is only loaded once a request is made
+    from google import genai
+
     api_key = os.environ.get("GENAI_API_KEY")  # Get the API key from environment variables
     client = genai.Client(api_key=api_key)  # Initialize the GenAI client
 
@@ -87,8 +93,8 @@ def main():
             examples_text += f'Category: {category}, Keyword: {kw}\n'
 
     # Read the bank statement data from JSON
-    input_file = sys.argv[1] if len(sys.argv) > 1 else os.path.join(inputs_dir, "transactions.json")
-    output_file = sys.argv[2] if len(sys.argv) > 2 else os.path.join(script_dir, "..", "outputs", "AI_Categorisation.json")
+    input_file = input_file or os.path.join(inputs_dir, "transactions.json")
+    output_file = output_file or os.path.join(script_dir, "..", "outputs", "AI_Categorisation.json")
     with open(input_file, "r", encoding="utf-8") as f:
         transactions = json.load(f)
 
@@ -150,4 +156,8 @@ def main():
     print(f"Done .... script execution time: {duration:.2f} seconds")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Categorize transactions with GenAI.")
+    parser.add_argument("input_file", nargs="?", help="Transactions JSON file (default: inputs/transactions.json).")
+    parser.add_argument("output_file", nargs="?", help="Output JSON file (default: outputs/AI_Categorisation.json).")
+    args = parser.parse_args()
+    main(args.input_file, args.output_file)
@@ -24,7 +24,6 @@ Typical usage:
 
 import json
 from collections import defaultdict, Counter
-import matplotlib.pyplot as plt
 import os
 import sys
 
@@ -180,7 +179,7 @@ def print_confidence_statistics(keyword_confidence):
         - If no valid confidence values are found, prints a corresponding message.
     
     Notes:
-        - The function expects matplotlib.pyplot as plt and os to be imported.
+        - matplotlib is imported only when there are confidence values to plot.
         - The outputs directory is assumed to be located one level above the script's directory.
     """
 
@@ -192,6 +191,7 @@ def print_confidence_statistics(keyword_confidence):
         print(f"  Avg confidence: {sum(confidences)/len(confidences):.2f}")
 
         # Plot histogram of confidence values
+        import matplotlib.pyplot as plt
         plt.figure(figsize=(7, 4))
         plt.hist(confidences, bins=20, color='skyblue', edgecolor='black')
         plt.title("Histogram of Keyword Confidence Scores")
@@ -2,7 +2,6 @@ import json
 import time
 from pathlib import Path
 import os
-import google.generativeai as genai
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 outputs_dir = os.path.join(script_dir, "..", "outputs")
@@ -11,9 +10,16 @@ inputs_dir = os.path.join(script_dir, "..", "inputs")
 INPUT_PATH = Path(os.path.join(outputs_dir, "AI_Categorisation.json"))
 OUTPUT_PATH = Path(os.path.join(outputs_dir, "AI_Categorisation_refined.json"))
 
-# Setup Gemini Flash
-genai.configure(api_key="GEMINI_API_KEY")  # Replace with your actual key
-model = genai.GenerativeModel("models/gemini-1.5-flash")
+_model = None
+
+def get_model():
+    """Create the Gemini Flash model on first use, so importing this module stays cheap."""
+    global _model
+    if _model is None:
+        import google.generativeai as genai
+        genai.configure(api_key="GEMINI_API_KEY")  # Replace with your actual key
+        _model = genai.GenerativeModel("models/gemini-1.5-flash")
+    return _model
 
 # Categories you expect
 KNOWN_CATEGORIES = [
@@ -60,7 +66,7 @@ Transactions:
 def process_batch(batch):
     prompt = build_batch_prompt(batch)
     try:
-        response = model.generate_content(prompt)
+        response = get_model().generate_content(prompt)
         result = json.loads(response.text)
         return result
     except Exception as e:
@@ -0,0 +1,137 @@
+"""
+bench_categorize.py
+
+Benchmark of the keyword categorization in analysis.py.
+Compares the former loop of one `str.contains` mask per keyword with the single-pass
+KeywordMatcher (pure Python, and pyahocorasick when installed), at 1,000 and 10,000
+keywords over synthetic transaction texts.
+
+The loop over keywords scales with rows x keywords; over the full row count it is timed
+on the first --legacy-keywords keywords and extrapolated (marked with ~). The results of
+all methods are compared over all keywords on --verify-rows rows.
+
+Usage:
+    python FinTrack/08_benchmarks/bench_categorize.py [--rows N] [--keywords 1000 10000]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "05_analysis"))
+
+from keyword_matcher import KeywordMatcher, ahocorasick  # noqa: E402
+
+ALPHABET = np.array(list("abcdefghijklmnopqrstuvwxyzäöüß"))
+
+def random_words(count, rng, min_len=3, max_len=10):
+    """Return `count` random lowercase words."""
+    lengths = rng.integers(min_len, max_len + 1, count)
+    return ["".join(rng.choice(ALPHABET, length)) for length in lengths]
+
+def make_texts(rows, distinct, rng):
+    """
+    Build transaction texts shaped like `sender_receiver booking_text purpose`.
+
+    Args:
+        rows (int): Number of texts.
+        distinct (float): Share of distinct texts (recurring payments repeat texts).
+        rng (numpy.random.Generator): Random generator.
+
+    Returns:
+        tuple: (pandas.Series of texts, list of the words used in them).
+    """
+    words = random_words(5_000, rng)
+    pool_size = max(1, int(rows * distinct))
+    pool = [
+        " ".join(rng.choice(words, rng.integers(3, 9))).title() + f" Ref {i:08d}"
+        for i in range(pool_size)
+    ]
+    texts = pd.Series(pool, dtype=object).take(rng.integers(0, pool_size, rows)).reset_index(drop=True)
+    return texts, words
+
+def make_categories(keywords, words, rng, category_count=20):
+    """
+    Build categorization rules with `keywords` keywords over `category_count` categories.
+
+    Half of the keywords are words of the texts (so most texts match several keywords),
+    the other half random words, mostly without match.
+    """
+    matching = list(rng.choice(words, keywords // 2))
+    keyword_list = matching + random_words(keywords - len(matching), rng, min_len=5)
+    rng.shuffle(keyword_list)
+    categories = {}
+    for i, keyword in enumerate(keyword_list):
+        categories.setdefault(f"Category {i % category_count}", []).append({"keyword": keyword})
+    return categories
+
+def legacy_categorize(texts, categories, limit=None):
+    """The former fast_categorize loop: one str.contains mask per keyword, the last one wins."""
+    text_col = texts.str.lower()
+    result = pd.Series("Other", index=texts.index)
+    done = 0
+    for cat, keywords in categories.items():
+        for kw_obj in keywords:
+            if limit is not None and done >= limit:
+                return result
+            kw = kw_obj['keyword'] if isinstance(kw_obj, dict) and 'keyword' in kw_obj else str(kw_obj)
+            mask = text_col.str.contains(re.escape(kw.lower()), regex=True)
+            result[mask] = cat
+            done += 1
+    return result
+
+def timed(func):
+    """Return (result, seconds) of calling func()."""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark keyword categorization.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of transactions (default: 1000000).")
+    parser.add_argument("--keywords", type=int, nargs="+", default=[1_000, 10_000], help="Keyword counts (default: 1000 10000).")
+    parser.add_argument("--distinct", type=float, default=0.2, help="Share of distinct texts (default: 0.2).")
+    parser.add_argument("--legacy-keywords", type=int, default=50, help="Keywords timed for the str.contains loop (default: 50).")
+    parser.add_argument("--verify-rows", type=int, default=2_000, help="Rows compared over all keywords (default: 2000).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    texts, words = make_texts(args.rows, args.distinct, rng)
+    print(f"{args.rows:,} transactions, {texts.nunique():,} distinct texts")
+
+    modes = {"KeywordMatcher (pure Python)": False}
+    if ahocorasick is not None:
+        modes["KeywordMatcher (pyahocorasick)"] = True
+
+    for keyword_count in args.keywords:
+        categories = make_categories(keyword_count, words, rng)
+
+        sample = texts.head(args.verify_rows)
+        expected = legacy_categorize(sample, categories)
+        for name, use_c in modes.items():
+            if not KeywordMatcher(categories, use_pyahocorasick=use_c).categorize(sample).equals(expected):
+                raise AssertionError(f"{name} does not match the str.contains loop at {keyword_count} keywords")
+
+        timed_keywords = min(args.legacy_keywords, keyword_count)
+        _, t_sample = timed(lambda: legacy_categorize(texts, categories, limit=timed_keywords))
+        t_legacy = t_sample * keyword_count / timed_keywords
+        legacy_mark = "~" if timed_keywords < keyword_count else " "
+
+        print(f"\n{keyword_count:,} keywords")
+        print(f"{'method':<34}{'build s':>9}{'match s':>11}{'rows/s':>14}{'speedup':>10}")
+        print(f"{'str.contains per keyword':<34}{'':>9}{legacy_mark:>1}{t_legacy:>10.2f}"
+              f"{args.rows / t_legacy:>14,.0f}{1:>9.1f}x")
+        for name, use_c in modes.items():
+            matcher, t_build = timed(lambda: KeywordMatcher(categories, use_pyahocorasick=use_c))
+            _, t_match = timed(lambda: matcher.categorize(texts))
+            print(f"{name:<34}{t_build:>9.2f}{t_match:>11.2f}{args.rows / t_match:>14,.0f}"
+                  f"{t_legacy / (t_build + t_match):>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+bench_hashing.py
+
+Benchmark of the transaction_hash computation in db_update.py.
+Compares the row-wise `df.apply(row_hash, axis=1)` with the batched hash_transactions,
+in compatible (SHA-256) and fast (64-bit) mode, on a synthetic cleaned DataFrame.
+
+Usage:
+    python FinTrack/08_benchmarks/bench_hashing.py [--rows N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "03_data_cleaning"))
+
+from db_update import ALL_COLUMNS, NUMERIC_COLUMNS, hash_transactions, row_hash  # noqa: E402
+
+def make_frame(rows, seed=0):
+    """
+    Build a synthetic DataFrame shaped like the output of map_and_clean.
+
+    Args:
+        rows (int): Number of rows.
+        seed (int, optional): Random seed.
+
+    Returns:
+        pandas.DataFrame: DataFrame with all ALL_COLUMNS.
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    for col in ALL_COLUMNS:
+        if col in NUMERIC_COLUMNS:
+            data[col] = rng.normal(0, 500, rows).round(2)
+        else:
+            data[col] = pd.Series(rng.integers(0, 5000, rows)).map(lambda i, c=col: f"{c} {i}")
+    data["date"] = pd.to_datetime(rng.integers(1.5e9, 1.7e9, rows), unit="s").strftime("%d.%m.%Y")
+    data["bank_name"] = "Bank_A"
+    return pd.DataFrame(data)
+
+def timed(func):
+    """Return (result, seconds) of calling func()."""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transaction hashing.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Number of rows (default: 100000).")
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    legacy, t_legacy = timed(lambda: df.apply(row_hash, axis=1))
+    compat, t_compat = timed(lambda: hash_transactions(df, compat=True))
+    _, t_fast = timed(lambda: hash_transactions(df, compat=False))
+
+    if not legacy.equals(compat.astype(legacy.dtype)):
+        raise AssertionError("hash_transactions(compat=True) does not match row_hash")
+
+    print(f"{'method':<32}{'seconds':>10}{'rows/s':>14}{'speedup':>10}")
+    for name, seconds in [
+        ("apply(row_hash, axis=1)", t_legacy),
+        ("hash_transactions(compat=True)", t_compat),
+        ("hash_transactions(compat=False)", t_fast),
+    ]:
+        print(f"{name:<32}{seconds:>10.3f}{args.rows / seconds:>14,.0f}{t_legacy / seconds:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
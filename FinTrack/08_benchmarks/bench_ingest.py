@@ -0,0 +1,148 @@
+"""
+bench_ingest.py
+
+Benchmark of the ingestion stages of db_update.py on synthetic bank statements.
+
+For each bank format, a statement file is generated with generate_statements.py and the
+stages detect_csv_format, load_csv_with_mapping, hash_transactions and save_to_sqlite are
+timed separately. hash_transactions is timed on the frame map_and_clean hashes
+('dd.mm.YYYY' date strings and plain text columns), not on the compacted frame it returns.
+Each stage reports its throughput in rows/s and its peak memory measured with tracemalloc
+in a second run (tracing slows Python code down too much to be timed). Results can be
+appended to a JSON-lines file to compare runs.
+
+Usage:
+    python FinTrack/08_benchmarks/bench_ingest.py [--rows N] [--banks Bank_A ...] [--results FILE]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from itertools import count
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "03_data_cleaning"))
+
+from bank_profiles import PROFILES  # noqa: E402
+from db_update import (  # noqa: E402
+    CATEGORICAL_COLUMNS, create_transactions_table, detect_csv_format, hash_transactions, load_csv_with_mapping,
+    save_to_sqlite,
+)
+from generate_statements import generate  # noqa: E402
+
+def measure(func):
+    """
+    Call func() twice: once to time it and once to measure its peak memory.
+
+    Args:
+        func (callable): Function without arguments; both calls must do the same work.
+
+    Returns:
+        tuple: (result of the timed call, seconds, peak memory in bytes).
+    """
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+def hash_input(df):
+    """
+    Rebuild the frame map_and_clean passes to hash_transactions from the frame it returns.
+
+    Args:
+        df (pandas.DataFrame): Output of load_csv_with_mapping.
+
+    Returns:
+        pandas.DataFrame: The transactions with 'dd.mm.YYYY' date strings and the
+        CATEGORICAL_COLUMNS as strings.
+
+    Raises:
+        ValueError: If the rebuilt frame does not hash to the stored transaction hashes.
+    """
+    frame = df.drop(columns="transaction_hash").astype({col: str for col in CATEGORICAL_COLUMNS})
+    frame["date"] = frame["date"].dt.strftime("%d.%m.%Y")
+    if not hash_transactions(frame).equals(df["transaction_hash"]):
+        raise ValueError("The rebuilt frame does not match the frame hashed by map_and_clean.")
+    return frame
+
+def bench_file(path, profile, db_dir):
+    """
+    Time the ingestion stages on one statement file.
+
+    Args:
+        path (str): Path of the statement CSV file.
+        profile (BankProfile): Bank profile the file was generated with.
+        db_dir (str): Directory for the SQLite databases saved into.
+
+    Returns:
+        list: One dict per stage with the stage name, seconds and peak memory.
+    """
+    stages = []
+    _, seconds, peak = measure(lambda: detect_csv_format(path))
+    stages.append({"stage": "detect_csv_format", "seconds": seconds, "peak_bytes": peak})
+
+    df, seconds, peak = measure(lambda: load_csv_with_mapping(path, profile.name))
+    stages.append({"stage": "load_csv_with_mapping", "seconds": seconds, "peak_bytes": peak})
+
+    frame = hash_input(df)
+    _, seconds, peak = measure(lambda: hash_transactions(frame))
+    stages.append({"stage": "hash_transactions", "seconds": seconds, "peak_bytes": peak})
+
+    # Each run saves into a new database, so both insert all rows
+    db_paths = (os.path.join(db_dir, f"{profile.name}-{i}.db") for i in count())
+
+    def save():
+        db_path = next(db_paths)
+        create_transactions_table(db_path)
+        return save_to_sqlite(df, db_path=db_path)
+
+    _, seconds, peak = measure(save)
+    stages.append({"stage": "save_to_sqlite", "seconds": seconds, "peak_bytes": peak})
+    return stages
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion stages of db_update.py.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Transactions per file (default: 100000).")
+    parser.add_argument("--banks", nargs="+", help="Banks to benchmark (default: all).")
+    parser.add_argument("--data-dir", help="Directory for the generated files (default: a temporary directory).")
+    parser.add_argument("--results", help="Append the results as JSON lines to this file.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    profiles = {profile.name: profile for profile in PROFILES}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir or tmp_dir
+        paths = generate(data_dir, args.rows, args.banks)
+
+        print(f"{'bank':<8}{'stage':<24}{'seconds':>10}{'rows/s':>14}{'peak MB':>10}")
+        records = []
+        for bank, path in paths.items():
+            for stage in bench_file(path, profiles[bank], tmp_dir):
+                rows_per_second = args.rows / stage["seconds"] if stage["seconds"] else float("inf")
+                print(
+                    f"{bank:<8}{stage['stage']:<24}{stage['seconds']:>10.3f}"
+                    f"{rows_per_second:>14,.0f}{stage['peak_bytes'] / 1e6:>10.1f}"
+                )
+                records.append({"bank": bank, "rows": args.rows, "rows_per_second": rows_per_second, **stage})
+
+    if args.results:
+        run = datetime.now().isoformat(timespec="seconds")
+        with open(args.results, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps({"run": run, **record}) + "\n")
+
+if __name__ == "__main__":
+    main()
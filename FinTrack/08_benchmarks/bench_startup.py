@@ -0,0 +1,72 @@
+"""
+bench_startup.py
+
+Benchmark of the startup time of FinTrack's modules and command-line entry points.
+
+Each command runs in a fresh interpreter, several times; the median wall time is
+reported next to that of an empty interpreter. Importing a module should stay close to
+the cost of its core dependencies (pandas), since plotting, PDF and GenAI libraries are
+only imported by the commands that use them.
+
+Usage:
+    python FinTrack/08_benchmarks/bench_startup.py [--repeat N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FINTRACK_DIR = os.path.dirname(BENCH_DIR)
+
+# name -> (directory added to sys.path and used as working directory, Python code)
+COMMANDS = {
+    "python (empty)": ("03_data_cleaning", "pass"),
+    "import pandas": ("03_data_cleaning", "import pandas"),
+    "import db_update": ("03_data_cleaning", "import db_update"),
+    "import analysis": ("05_analysis", "import analysis"),
+    "import main_categorization": ("07_AI_categorisation", "import main_categorization"),
+    "import GenCat": ("07_AI_categorisation/scripts", "import GenCat"),
+    "db_update.py --help": ("03_data_cleaning", "db_update.py --help"),
+    "analysis.py --help": ("05_analysis", "analysis.py --help"),
+}
+
+def run(directory, code):
+    """
+    Run a command in a fresh interpreter and return its wall time.
+
+    Args:
+        directory (str): Directory, relative to FinTrack, to run the command in.
+        code (str): Python code, or a script followed by its arguments.
+
+    Returns:
+        float: Seconds, or None if the command failed (e.g. a missing dependency).
+    """
+    cwd = os.path.join(FINTRACK_DIR, directory)
+    if code.split()[0].endswith(".py"):
+        args = [sys.executable, *code.split()]
+    else:
+        args = [sys.executable, "-c", f"import sys; sys.path.insert(0, '.'); {code}"]
+    start = time.perf_counter()
+    completed = subprocess.run(args, cwd=cwd, capture_output=True)
+    seconds = time.perf_counter() - start
+    return seconds if completed.returncode == 0 else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the startup time of FinTrack's modules and commands.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command (default: 5).")
+    args = parser.parse_args()
+
+    print(f"{'command':<32}{'median s':>10}{'min s':>10}")
+    for name, (directory, code) in COMMANDS.items():
+        times = [run(directory, code) for _ in range(args.repeat)]
+        if None in times:
+            print(f"{name:<32}{'failed (missing dependency?)':>30}")
+            continue
+        print(f"{name:<32}{statistics.median(times):>10.3f}{min(times):>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+generate_statements.py
+
+Generator of synthetic bank statement CSV files in the formats of the supported banks.
+
+Each file uses the header, separator, date format and encoding of a bank profile
+(Bank_A to Bank_D, see bank_profiles.py), German number formatting ("-1.234,56") and
+preamble lines before the header, like the real exports. Rows are written in blocks,
+so files of several million rows are generated with bounded memory.
+
+Usage:
+    python FinTrack/08_benchmarks/generate_statements.py [--rows N] [--banks Bank_A ...] [--out DIR]
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "03_data_cleaning"))
+
+from bank_profiles import PROFILES  # noqa: E402
+
+DEFAULT_OUT_DIR = os.path.join(BENCH_DIR, "data")
+BLOCK_ROWS = 100_000
+
+# Lines written before the header, as in the banks' exports
+PREAMBLES = {
+    "Bank_A": ["Umsatzanzeige;Datei erstellt am: 01.01.2025", "IBAN;DE00 1234 5678 9012 3456 78", "Kontoname;Girokonto"],
+    "Bank_B": ["Kontoumsätze;Girokonto", "Zeitraum;01.01.2024 - 31.12.2024"],
+    "Bank_C": ["Umsätze;Privatkonto"],
+    "Bank_D": ["Kontoumsätze Girokonto;;", "Kontostand;1.234,56 EUR", "", "Buchungen"],
+}
+
+NAMES = [
+    "REWE Markt GmbH", "Amazon EU S.a.r.l.", "Stadtwerke München", "Hausverwaltung Müller",
+    "ARAL Tankstelle", "Arbeitgeber GmbH", "Apotheke am Markt", "Deutsche Bahn", "Netflix", "Finanzamt",
+]
+BOOKING_TEXTS = ["Lastschrift", "Gutschrift", "Kartenzahlung", "Dauerauftrag", "Überweisung"]
+
+def german_amounts(values):
+    """
+    Format amounts in German notation with thousands separators, e.g. -1.234,56.
+
+    Args:
+        values (numpy.ndarray): Amounts.
+
+    Returns:
+        list: The formatted amounts.
+    """
+    table = str.maketrans(",.", ".,")
+    return [f"{value:,.2f}".translate(table) for value in values]
+
+def make_block(profile, start, rows, rng):
+    """
+    Build a block of statement rows in the format of a bank profile.
+
+    Args:
+        profile (BankProfile): Bank profile.
+        start (int): Index of the first row, used for references.
+        rows (int): Number of rows.
+        rng (numpy.random.Generator): Random generator.
+
+    Returns:
+        pandas.DataFrame: The rows as strings, one column per header of the profile.
+    """
+    index = np.arange(start, start + rows)
+    dates = pd.Series(pd.to_datetime(rng.integers(1.45e9, 1.75e9, rows), unit="s"))
+    amounts = rng.normal(-50, 800, rows).round(2)
+    values = {
+        "date": dates.dt.strftime(profile.date_format),
+        "value_date": (dates + pd.to_timedelta(rng.integers(0, 3, rows), unit="D")).dt.strftime(profile.date_format),
+        "sender_receiver": rng.choice(NAMES, rows),
+        "booking_text": rng.choice(BOOKING_TEXTS, rows),
+        "purpose": [f"Rechnung {i} Kd-Nr. {i % 9973}" for i in index],
+        "amount": german_amounts(amounts),
+        "balance": german_amounts(np.cumsum(amounts) + 10_000),
+        "currency": "EUR",
+        "iban": [f"DE{i % 97:02d}{i:018d}" for i in index],
+        "bic": "DEUTDEFFXXX",
+        "account_number": "DE00123456789012345678",
+        "creditor_id": np.where(index % 3 == 0, "DE98ZZZ09999999999", ""),
+        "mandate_reference": np.where(index % 3 == 0, [f"M-{i % 1000}" for i in index], ""),
+        "customer_reference": np.where(index % 2 == 0, [f"E2E-{i}" for i in index], ""),
+        "collector_reference": "",
+        "original_debit_amount": "",
+        "return_debit_expense": "",
+        "info": "Umsatz gebucht",
+        "debit": np.where(amounts < 0, german_amounts(amounts), ""),
+        "credit": np.where(amounts >= 0, german_amounts(amounts), ""),
+    }
+    if profile.name == "Bank_D":
+        values["info"] = ""
+    return pd.DataFrame({
+        i: values[profile.column_map[header]] for i, header in enumerate(profile.headers)
+    })
+
+def write_statement(path, profile, rows, seed=0, block_rows=BLOCK_ROWS):
+    """
+    Write a synthetic statement CSV file in the format of a bank profile.
+
+    Args:
+        path (str): Path of the CSV file.
+        profile (BankProfile): Bank profile.
+        rows (int): Number of transactions.
+        seed (int, optional): Random seed.
+        block_rows (int, optional): Number of rows generated and written at a time.
+
+    Returns:
+        None
+    """
+    rng = np.random.default_rng(seed)
+    with open(path, "w", encoding=profile.encoding, newline="") as f:
+        for line in PREAMBLES.get(profile.name, []):
+            f.write(line + "\n")
+        f.write(profile.sep.join(profile.headers) + "\n")
+        for start in range(0, rows, block_rows):
+            block = make_block(profile, start, min(block_rows, rows - start), rng)
+            block.to_csv(f, sep=profile.sep, header=False, index=False, lineterminator="\n")
+
+def generate(out_dir=DEFAULT_OUT_DIR, rows=10_000, banks=None, seed=0):
+    """
+    Write one synthetic statement file per bank.
+
+    Args:
+        out_dir (str, optional): Output directory.
+        rows (int, optional): Number of transactions per file.
+        banks (list, optional): Names of the banks (default: all profiles).
+        seed (int, optional): Random seed.
+
+    Returns:
+        dict: Path of the written file per bank name.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {}
+    for profile in PROFILES:
+        if banks and profile.name not in banks:
+            continue
+        path = os.path.join(out_dir, f"{profile.name}-{rows}.csv")
+        write_statement(path, profile, rows, seed=seed)
+        paths[profile.name] = path
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic bank statement CSV files.")
+    parser.add_argument("--rows", type=int, default=10_000, help="Transactions per file, e.g. 10000 to 10000000 (default: 10000).")
+    parser.add_argument("--banks", nargs="+", help="Banks to generate (default: all).")
+    parser.add_argument("--out", default=DEFAULT_OUT_DIR, help=f"Output directory (default: {DEFAULT_OUT_DIR}).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    args = parser.parse_args()
+
+    for bank, path in generate(args.out, args.rows, args.banks, args.seed).items():
+        print(f"{bank}: {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
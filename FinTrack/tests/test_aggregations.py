@@ -0,0 +1,126 @@
+"""
+test_aggregations.py
+
+Checks that the report's summary tables computed in SQLite over the monthly rollup
+(aggregations.sql_aggregations) match those computed in pandas from the transactions
+(aggregations.frame_aggregations), on a temporary database built from synthetic
+statements (08_benchmarks/generate_statements.py).
+
+Usage:
+    python -m unittest discover FinTrack/tests
+"""
+
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+for folder in ("03_data_cleaning", "05_analysis", "08_benchmarks"):
+    sys.path.insert(0, os.path.join(TESTS_DIR, "..", folder))
+
+from aggregations import frame_aggregations, transaction_filter, verify_aggregations  # noqa: E402
+from category_store import categorize_transactions, rule_version  # noqa: E402
+from db_update import create_indexes, create_manifest_table, create_transactions_table, ingest_files  # noqa: E402
+from generate_statements import generate  # noqa: E402
+
+ROWS = 500
+
+CATEGORIES = {
+    "Groceries": ["REWE"],
+    "Utilities": ["Stadtwerke"],
+    "Mobility": ["ARAL", "Bahn"],
+    "Income": ["Arbeitgeber"],
+}
+
+# Transactions without a valid date: (date, amount, bank_name, sender_receiver)
+UNDATED = [
+    (None, -123.45, "Bank_A", "REWE Markt GmbH"),
+    ("garbage", 50.0, "Bank_B", "Arbeitgeber GmbH"),
+    ("", -7.5, "Bank_C", "Netflix"),
+]
+
+def insert_undated(db_path):
+    """Insert the UNDATED transactions directly, as no statement format produces them."""
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO transactions (date, amount, bank_name, sender_receiver, transaction_hash) VALUES (?, ?, ?, ?, ?)",
+            [row + (f"undated-{i}",) for i, row in enumerate(UNDATED)],
+        )
+    conn.close()
+
+def load_selected(db_path, years=None, banks=None):
+    """Load the transactions selected by years and banks, as analysis.load_transactions does."""
+    condition, params = transaction_filter(years, banks)
+    query = "SELECT transaction_hash, date, amount, bank_name, sender_receiver, booking_text, purpose FROM transactions"
+    conn = sqlite3.connect(db_path)
+    try:
+        df = pd.read_sql_query(query + (f" WHERE {condition}" if condition else ""), conn, params=params)
+    finally:
+        conn.close()
+    df["date"] = pd.to_datetime(df["date"], format="ISO8601", errors="coerce")
+    return df
+
+class AggregationsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.db_path = os.path.join(cls.tmp_dir.name, "bank_statements.db")
+        create_transactions_table(cls.db_path)
+        create_manifest_table(cls.db_path)
+        create_indexes(cls.db_path)
+        paths = generate(os.path.join(cls.tmp_dir.name, "raw"), rows=ROWS, banks=["Bank_A", "Bank_B", "Bank_C"])
+        ingest_files(list(paths.values()), db_path=cls.db_path, metrics_path=None)
+        insert_undated(cls.db_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def assert_aggregations_match(self, categories, years=None, banks=None):
+        df = load_selected(self.db_path, years=years, banks=banks)
+        self.assertFalse(df.empty)
+        df["category"] = categorize_transactions(df, categories, self.db_path)["category"]
+        mismatches = verify_aggregations(df, self.db_path, rule_version(categories), years=years, banks=banks)
+        self.assertEqual(mismatches, [])
+
+    def test_all_transactions(self):
+        self.assert_aggregations_match(CATEGORIES)
+
+    def test_filters(self):
+        for years, banks in [([2024], None), (None, ["Bank_A"]), ([2023, 2024], ["Bank_B", "Bank_C"])]:
+            with self.subTest(years=years, banks=banks):
+                self.assert_aggregations_match(CATEGORIES, years=years, banks=banks)
+
+    def test_changed_rules(self):
+        self.assert_aggregations_match(CATEGORIES)
+        changed = {**CATEGORIES, "Entertainment": ["Netflix"], "Groceries": ["REWE", "Apotheke"]}
+        self.assert_aggregations_match(changed)
+        self.assert_aggregations_match(CATEGORIES)
+
+    def test_new_transactions(self):
+        self.assert_aggregations_match(CATEGORIES)
+        paths = generate(os.path.join(self.tmp_dir.name, "raw_new"), rows=ROWS, banks=["Bank_D"], seed=1)
+        ingest_files(list(paths.values()), db_path=self.db_path, metrics_path=None)
+        self.assert_aggregations_match(CATEGORIES)
+
+    def test_undated_transactions(self):
+        df = load_selected(self.db_path)
+        df["category"] = categorize_transactions(df, CATEGORIES, self.db_path)["category"]
+        tables = frame_aggregations(df)
+        undated_total = sum(amount for _, amount, _, _ in UNDATED)
+        # Counted in the category table, not in the tables by year or month
+        self.assertAlmostEqual(tables["category"]["Net_Balance"].sum(), df["amount"].sum())
+        self.assertAlmostEqual(tables["yearly"]["Net_Balance"].sum(), df["amount"].sum() - undated_total)
+        self.assertEqual(verify_aggregations(df, self.db_path, rule_version(CATEGORIES)), [])
+
+if __name__ == "__main__":
+    unittest.main()
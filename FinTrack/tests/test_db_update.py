@@ -0,0 +1,181 @@
+"""
+test_db_update.py
+
+Tests of the import of bank statement files into a temporary database (db_update.py).
+
+Usage:
+    python -m unittest discover FinTrack/tests
+"""
+
+import contextlib
+import io
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "03_data_cleaning"))
+
+from bank_profiles import PROFILES  # noqa: E402
+from db_update import (  # noqa: E402
+    ALL_COLUMNS_WITH_HASH, SCHEMA_VERSION, create_indexes, create_manifest_table, create_transactions_table,
+    _init_worker_logging, explain_queries, get_schema_version, ingest_files, is_file_current, is_file_ingested,
+    migrate_transactions_table, watch_raw_data,
+)
+from rollup import CATEGORY_TABLE, create_category_table, update_rollup  # noqa: E402
+from staging import load_staging, staged_sources  # noqa: E402
+
+BANK_B_HEADER = "Buchungstag;Wertstellungstag;Buchungstext;Name Gegenkonto;GegenIBAN;Verwendungszweck;Umsatz;Währung"
+
+# Two overlapping Bank_B exports. GegenIBAN is read as integers from the first one and
+# as text from the second one, which also has a non-numeric IBAN.
+OVERLAPPING_EXPORTS = {
+    "Bank_B-2024-01.csv": [
+        "02.01.2024;02.01.2024;Lastschrift;REWE Markt GmbH;123456789;Einkauf;-12,50;EUR",
+        "03.01.2024;03.01.2024;Gutschrift;Arbeitgeber GmbH;987654321;Gehalt;2.000,00;EUR",
+    ],
+    "Bank_B-2024-02.csv": [
+        "02.01.2024;02.01.2024;Lastschrift;REWE Markt GmbH;123456789;Einkauf;-12,50;EUR",
+        "03.01.2024;03.01.2024;Gutschrift;Arbeitgeber GmbH;987654321;Gehalt;2.000,00;EUR",
+        "04.01.2024;04.01.2024;Lastschrift;Netflix;DE00123;Abo;-9,99;EUR",
+    ],
+}
+
+def write_export(directory, name, header, rows, encoding="utf-8"):
+    """Write a statement file with a header line and rows, and return its path."""
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding=encoding) as f:
+        f.write("\n".join([header] + rows) + "\n")
+    return path
+
+def count_transactions(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    finally:
+        conn.close()
+
+class IngestTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "bank_statements.db")
+        create_transactions_table(self.db_path)
+        create_manifest_table(self.db_path)
+        create_indexes(self.db_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def test_overlapping_exports_fast_hash(self):
+        paths = [
+            write_export(self.tmp_dir.name, name, BANK_B_HEADER, rows)
+            for name, rows in OVERLAPPING_EXPORTS.items()
+        ]
+        for chunksize in (None, 1):
+            with self.subTest(chunksize=chunksize):
+                for _ in range(2):
+                    for path in paths:
+                        ingest_files([path], db_path=self.db_path, chunksize=chunksize, hash_compat=False, metrics_path=None)
+                self.assertEqual(count_transactions(self.db_path), 3)
+
+    def test_header_only_exports(self):
+        # An export without transactions is imported as empty and recorded, not retried
+        for profile in PROFILES:
+            for chunksize in (None, 10):
+                with self.subTest(bank=profile.name, chunksize=chunksize):
+                    path = write_export(
+                        self.tmp_dir.name, f"{profile.name}-empty-{chunksize}.csv",
+                        profile.sep.join(profile.headers), [], encoding=profile.encoding,
+                    )
+                    results = ingest_files([path], db_path=self.db_path, chunksize=chunksize, metrics_path=None)
+                    self.assertEqual(results, {path: (0, 0)})
+                    self.assertTrue(is_file_ingested(path, db_path=self.db_path))
+        self.assertEqual(count_transactions(self.db_path), 0)
+
+    def test_staging_after_import(self):
+        # Files imported before --staging was used are imported again to stage them
+        staging_dir = os.path.join(self.tmp_dir.name, "staging")
+        paths = [
+            write_export(self.tmp_dir.name, name, BANK_B_HEADER, rows)
+            for name, rows in OVERLAPPING_EXPORTS.items()
+        ]
+        ingest_files(paths, db_path=self.db_path, metrics_path=None)
+        for path in paths:
+            self.assertTrue(is_file_current(path, db_path=self.db_path))
+            self.assertFalse(is_file_current(path, db_path=self.db_path, staged=staged_sources(staging_dir)))
+
+        ingest_files(paths, db_path=self.db_path, staging_dir=staging_dir, metrics_path=None)
+        for path in paths:
+            self.assertTrue(is_file_current(path, db_path=self.db_path, staged=staged_sources(staging_dir)))
+        self.assertEqual(len(load_staging(staging_dir=staging_dir)), count_transactions(self.db_path))
+
+    def test_explain_flags_full_scans(self):
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            create_category_table(conn)
+            update_rollup(conn)
+        conn.close()
+        # A scan reads every row even through a covering index
+        covering_scan = {
+            "count": (
+                f"SELECT COUNT(*) FROM transactions t LEFT JOIN {CATEGORY_TABLE} c "
+                "ON c.transaction_hash = t.transaction_hash WHERE c.transaction_hash IS NULL",
+                (),
+            ),
+        }
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(explain_queries(self.db_path, covering_scan), ["count"])
+            self.assertEqual(explain_queries(self.db_path), [])
+
+    def test_migrate_legacy_table(self):
+        legacy_path = os.path.join(self.tmp_dir.name, "legacy.db")
+        conn = sqlite3.connect(legacy_path)
+        with conn:
+            conn.execute(f"CREATE TABLE transactions ({', '.join(f'{col} TEXT' for col in ALL_COLUMNS_WITH_HASH)})")
+            conn.executemany(
+                "INSERT INTO transactions (date, amount, transaction_hash) VALUES (?, ?, ?)",
+                [("02.01.2024", "-12.5", "a"), ("", "9.99", "b")],
+            )
+        conn.close()
+
+        migrate_transactions_table(legacy_path)
+        self.assertEqual(get_schema_version(legacy_path), SCHEMA_VERSION)
+        conn = sqlite3.connect(legacy_path)
+        try:
+            rows = conn.execute("SELECT date, amount FROM transactions ORDER BY id").fetchall()
+        finally:
+            conn.close()
+        # Undated rows are NULL, as in a new import
+        self.assertEqual(rows, [("2024-01-02", -12.5), (None, 9.99)])
+
+    def test_watch_with_workers(self):
+        raw_dir = os.path.join(self.tmp_dir.name, "raw")
+        os.makedirs(raw_dir)
+        paths = [write_export(raw_dir, name, BANK_B_HEADER, rows) for name, rows in OVERLAPPING_EXPORTS.items()]
+        # Files are imported once they are unchanged between two polls
+        watch_raw_data(
+            raw_dir, db_path=self.db_path, interval=0, workers=2, max_polls=2,
+            marker_path=os.path.join(self.tmp_dir.name, "ingest.ready"), metrics_path=None,
+        )
+        self.assertTrue(all(is_file_ingested(path, db_path=self.db_path) for path in paths))
+        self.assertEqual(count_transactions(self.db_path), 3)
+
+    def test_worker_logging(self):
+        # Spawned workers do not inherit the log handlers of the calling process
+        log_file = os.path.join(self.tmp_dir.name, "worker.log")
+        logging.disable(logging.NOTSET)
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(1, initializer=_init_worker_logging, initargs=(log_file,)) as pool:
+            pool.apply(logging.info, ("Message from a worker",))
+        with open(log_file, encoding="utf-8") as f:
+            self.assertIn("Message from a worker", f.read())
+
+if __name__ == "__main__":
+    unittest.main()
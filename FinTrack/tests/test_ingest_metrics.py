@@ -0,0 +1,49 @@
+"""
+test_ingest_metrics.py
+
+Tests of the per-stage import metrics (ingest_metrics.py).
+
+Usage:
+    python -m unittest discover FinTrack/tests
+"""
+
+import os
+import sys
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "03_data_cleaning"))
+
+from ingest_metrics import peak_memory_mb, stage, track_file  # noqa: E402
+
+# Memory allocated by a stage, in MB
+ALLOCATION_MB = 200
+
+def allocate():
+    """Allocate and touch ALLOCATION_MB of memory, then release it."""
+    block = bytearray(ALLOCATION_MB * 1024 * 1024)
+    del block
+
+@unittest.skipIf(peak_memory_mb() is None, "peak memory is not available on this platform")
+class PeakIncreaseTest(unittest.TestCase):
+
+    def test_increase_per_file(self):
+        with track_file("first.csv") as first:
+            with stage("parse"):
+                with stage("clean"):
+                    allocate()
+        # The second file allocates as much, below the peak reached by the first one
+        with track_file("second.csv") as second:
+            with stage("parse"):
+                allocate()
+
+        # Counted for the nested stage only
+        self.assertGreater(first.stages["clean"]["peak_increase_mb"], ALLOCATION_MB / 2)
+        self.assertLess(first.stages["parse"]["peak_increase_mb"], ALLOCATION_MB / 2)
+        total = first.records("run")[-1]
+        self.assertEqual(total["stage"], "total")
+        self.assertGreater(total["peak_increase_mb"], ALLOCATION_MB / 2)
+        self.assertLess(second.records("run")[-1]["peak_increase_mb"], ALLOCATION_MB / 2)
+
+if __name__ == "__main__":
+    unittest.main()